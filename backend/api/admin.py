@@ -0,0 +1,53 @@
+from django.contrib.auth import get_permission_codename
+from django.db import router, transaction
+
+
+class BulkDeleteAdminMixin:
+    """Удаление через api.deletion вместо Collector.
+
+    Страница подтверждения показывает только число связанных строк:
+    стандартная строит дерево из всех удаляемых объектов и на больших
+    аккаунтах не открывается. Удаление идёт вне транзакции запроса
+    (ATOMIC_REQUESTS), иначе пачки api.deletion не коммитились бы по
+    отдельности и блокировки держались бы до конца удаления.
+    """
+
+    bulk_delete = None
+
+    @transaction.non_atomic_requests
+    def changelist_view(self, request, extra_context=None):
+        if request.POST.get('action') == 'delete_selected':
+            return super().changelist_view(request, extra_context)
+        with transaction.atomic(using=router.db_for_write(self.model)):
+            return super().changelist_view(request, extra_context)
+
+    @transaction.non_atomic_requests
+    def delete_view(self, request, object_id, extra_context=None):
+        # ModelAdmin.delete_view оборачивает _delete_view в транзакцию.
+        return self._delete_view(request, object_id, extra_context)
+
+    def get_related_querysets(self, pks):
+        return ()
+
+    def get_deleted_objects(self, objs, request):
+        pks = [obj.pk for obj in objs]
+        model_count = {
+            self.model._meta.verbose_name_plural: len(pks)
+        }
+        perms_needed = set()
+        for queryset in self.get_related_querysets(pks):
+            opts = queryset.model._meta
+            count = queryset.count()
+            if not count:
+                continue
+            model_count[opts.verbose_name_plural] = count
+            codename = get_permission_codename('delete', opts)
+            if not request.user.has_perm(f'{opts.app_label}.{codename}'):
+                perms_needed.add(opts.verbose_name)
+        return [str(obj) for obj in objs], model_count, perms_needed, []
+
+    def delete_model(self, request, obj):
+        self.delete_queryset(request, self.model.objects.filter(pk=obj.pk))
+
+    def delete_queryset(self, request, queryset):
+        self.bulk_delete(queryset)
@@ -0,0 +1,44 @@
+import hashlib
+
+from django.core.cache import cache
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from .metrics import record_cache  # isort:skip
+from .utils import invalidated_cache_timeout  # isort:skip
+
+TOKEN_USER_KEY = 'token_user_%s'
+# Сохранение или удаление пользователя и удаление токена сбрасывают
+# запись сигналами. Срок нужен для путей в обход сигналов, например
+# QuerySet.update(is_active=False).
+TOKEN_USER_TIMEOUT = 5 * 60
+
+
+def token_cache_key(key):
+    return TOKEN_USER_KEY % hashlib.sha1(key.encode()).hexdigest()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication, который кэширует токен вместе с профилем.
+
+    Запрос с известным токеном не обращается к базе. Блокировка, смена
+    пароля и выход сбрасывают запись через сигналы в api.signals.
+    """
+
+    def authenticate_credentials(self, key):
+        cache_key = token_cache_key(key)
+        token = cache.get(cache_key)
+        record_cache('token_user', token is not None)
+        if token is None:
+            user, token = super().authenticate_credentials(key)
+            cache.set(cache_key, token,
+                      invalidated_cache_timeout() or TOKEN_USER_TIMEOUT)
+        return token.user, token
+
+
+def user_token_cache_keys(user_id):
+    return [
+        token_cache_key(key) for key in Token.objects.filter(
+            user_id=user_id
+        ).values_list('key', flat=True)
+    ]
@@ -0,0 +1,100 @@
+import json
+import logging
+from io import BytesIO
+from urllib.parse import urlsplit
+
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import transaction
+from django.http import Http404
+from django.urls import Resolver404, resolve
+from rest_framework import status
+from rest_framework.response import Response
+
+from .utils import get_request_memo  # isort:skip
+
+logger = logging.getLogger(__name__)
+
+BATCH_MAX_REQUESTS = 10
+BATCH_PREFIX = '/api/'
+
+
+def make_subrequest(request, path, query):
+    """GET-запрос к path с окружением и пользователем исходного запроса.
+
+    Аутентификация не повторяется: DRF берёт пользователя из
+    _force_auth_user. Словарь memo общий на весь пакет, поэтому то, что
+    один подзапрос уже посчитал за запрос, другие берут готовым.
+    """
+    environ = dict(request._request.environ)
+    for name in ('HTTP_IF_NONE_MATCH', 'CONTENT_TYPE'):
+        environ.pop(name, None)
+    environ.update({
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': path,
+        'QUERY_STRING': query,
+        'CONTENT_LENGTH': '0',
+        'wsgi.input': BytesIO(),
+    })
+    subrequest = WSGIRequest(environ)
+    if request.user.is_authenticated:
+        subrequest._force_auth_user = request.user
+        subrequest._force_auth_token = request.auth
+    subrequest.memo = get_request_memo(request)
+    return subrequest
+
+
+def response_data(response):
+    if isinstance(response, Response):
+        return response.data
+    if response.get('Content-Type', '').startswith('application/json'):
+        return json.loads(response.content)
+    return response.content.decode()
+
+
+def not_found(url):
+    return {
+        'url': url,
+        'status': status.HTTP_404_NOT_FOUND,
+        'data': {'detail': 'Страница не найдена.'},
+    }
+
+
+def dispatch_batch(request, urls):
+    """Каждый подзапрос в своей точке сохранения: ошибка базы в одном
+    не прерывает общую транзакцию для остальных."""
+    results = []
+    for url in urls:
+        parts = urlsplit(url)
+        try:
+            if not parts.path.startswith(BATCH_PREFIX):
+                raise Resolver404
+            match = resolve(parts.path)
+        except Resolver404:
+            match = None
+        if match is None or match.url_name == 'batch':
+            results.append(not_found(url))
+            continue
+        subrequest = make_subrequest(request, parts.path, parts.query)
+        subrequest.resolver_match = match
+        try:
+            with transaction.atomic():
+                response = match.func(subrequest, *match.args,
+                                      **match.kwargs)
+                data = response_data(response)
+        except Http404:
+            results.append(not_found(url))
+            continue
+        except Exception:
+            logger.exception('Ошибка подзапроса %s', url)
+            results.append({
+                'url': url,
+                'status': status.HTTP_500_INTERNAL_SERVER_ERROR,
+                'data': {'detail': 'Ошибка сервера.'},
+            })
+            continue
+        results.append({
+            'url': url,
+            'status': response.status_code,
+            'data': data,
+        })
+    return results
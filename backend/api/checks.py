@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.checks import Error, register
+
+from .utils import PROCESS_CACHES  # isort:skip
+
+
+@register()
+def check_shared_cache(app_configs, **kwargs):
+    """С кэшем на процесс у каждого воркера был бы свой лимит запросов."""
+    throttles = settings.REST_FRAMEWORK.get('DEFAULT_THROTTLE_CLASSES')
+    if not throttles:
+        return []
+    if settings.CACHES['default']['BACKEND'] not in PROCESS_CACHES:
+        return []
+    return [Error(
+        'Лимиты запросов требуют общего для всех процессов кэша.',
+        hint='Задайте CACHE_BACKEND и CACHE_LOCATION (например, memcached) '
+             'или отключите лимиты: THROTTLE_ENABLED=false.',
+        id='api.E001',
+    )]
@@ -0,0 +1,125 @@
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Q
+
+from events.models import OutboxEvent  # isort:skip
+from events.signals import (OUTBOX_FIELDS,  # isort:skip
+                            TOMBSTONE_FIELDS, write_events,
+                            write_tombstones)
+from recipes.models import (Cart, Favorite,  # isort:skip
+                            IngredientAmount, Recipe)
+from users.models import Follow  # isort:skip
+from .etags import bump_user_state_version  # isort:skip
+from .popularity import POPULARITY_WEIGHTS, add_popularity  # isort:skip
+from .subscriptions import invalidate_following_ids  # isort:skip
+
+User = get_user_model()
+
+DELETE_BATCH_SIZE = 1000
+RECIPE_BATCH_SIZE = 200
+USER_BATCH_SIZE = 20
+
+
+def forget_rows(model, rows, keep_popularity):
+    """То же, что делают сигналы post_delete, но на всю пачку сразу."""
+    if model in OUTBOX_FIELDS:
+        write_events(rows, OutboxEvent.DELETED)
+    if model in TOMBSTONE_FIELDS:
+        write_tombstones(rows)
+    user_ids = {row.user_id for row in rows} if model in (
+        Favorite, Cart, Follow
+    ) else set()
+    if model in POPULARITY_WEIGHTS and not keep_popularity:
+        changes = defaultdict(list)
+        for row in rows:
+            changes[row.recipe_id].append(
+                (-POPULARITY_WEIGHTS[model], row.created)
+            )
+        add_popularity(changes)
+
+    def clear_caches():
+        for user_id in user_ids:
+            bump_user_state_version(user_id)
+            if model is Follow:
+                invalidate_following_ids(user_id)
+    if user_ids:
+        transaction.on_commit(clear_caches)
+
+
+def delete_rows(queryset, batch_size=DELETE_BATCH_SIZE,
+                keep_popularity=False):
+    """Удаляет строки пачками одним DELETE на пачку.
+
+    В отличие от QuerySet.delete() не собирает связанные объекты через
+    Collector и не шлёт сигналы по каждой строке: outbox, кэши и
+    популярность обновляются по пачке в forget_rows. Каждая пачка в своей
+    транзакции, чтобы блокировки держались недолго.
+    """
+    model = queryset.model
+    fields = OUTBOX_FIELDS.get(model, ())
+    if fields and model in POPULARITY_WEIGHTS:
+        fields += ('created',)
+    pks = queryset.order_by().values_list('pk', flat=True)
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            batch = list(pks[:batch_size])
+            if not batch:
+                return deleted
+            rows = model.objects.filter(pk__in=batch)
+            forget_rows(
+                model,
+                list(rows.only(*fields) if fields else rows),
+                keep_popularity
+            )
+            deleted += rows._raw_delete(rows.db)
+
+
+def delete_recipes(queryset, batch_size=RECIPE_BATCH_SIZE, progress=None):
+    """Удаляет рецепты: сначала зависимые строки пачками, потом сами рецепты.
+
+    На сами рецепты остаётся обычный delete(), чтобы сработали их сигналы,
+    но Collector к этому моменту уже не находит связанных строк.
+    """
+    pks = queryset.order_by().values_list('pk', flat=True)
+    deleted = 0
+    while True:
+        batch = list(pks[:batch_size])
+        if not batch:
+            return deleted
+        for model in (IngredientAmount, Favorite, Cart):
+            delete_rows(model.objects.filter(recipe_id__in=batch),
+                        keep_popularity=True)
+        with transaction.atomic():
+            tags = Recipe.tags.through.objects.filter(recipe_id__in=batch)
+            tags._raw_delete(tags.db)
+            Recipe.objects.filter(pk__in=batch).delete()
+        deleted += len(batch)
+        if progress is not None:
+            progress(Recipe, deleted)
+
+
+def delete_users(queryset, batch_size=USER_BATCH_SIZE, progress=None):
+    pks = queryset.order_by().values_list('pk', flat=True)
+    deleted = 0
+    while True:
+        batch = list(pks[:batch_size])
+        if not batch:
+            return deleted
+        delete_recipes(Recipe.objects.filter(author_id__in=batch),
+                       progress=progress)
+        for related in (
+            Favorite.objects.filter(user_id__in=batch),
+            Cart.objects.filter(user_id__in=batch),
+            Follow.objects.filter(
+                Q(user_id__in=batch) | Q(following_id__in=batch)
+            ),
+        ):
+            delete_rows(related)
+        with transaction.atomic():
+            User.objects.filter(pk__in=batch).delete()
+        deleted += len(batch)
+        if progress is not None:
+            progress(User, deleted)
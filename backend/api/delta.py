@@ -0,0 +1,80 @@
+"""Выборки изменений для клиентов, которые опрашивают API.
+
+Клиент передаёт updated_since из ссылки next прошлого ответа и получает
+только то, что изменилось после этой отметки, а удалённое — по
+Tombstone. Выборка заканчивается на границе, которая отстаёт от текущего
+времени на DELTA_SYNC_LAG: строка получает отметку времени до коммита, и
+без отставания изменение из долгой транзакции проскочило бы между двумя
+опросами. Транзакции дольше отставания не коммитятся, это проверяет
+обёртка foodgram.db по отметке mark_delta_write.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from events.models import Tombstone  # isort:skip
+
+
+def get_horizon():
+    return timezone.now() - timedelta(seconds=settings.DELTA_SYNC_LAG)
+
+
+def get_oldest_since():
+    """Раньше этой отметки следы удалений уже вычищены prune_tombstones."""
+    return timezone.now() - timedelta(days=settings.DELTA_SYNC_RETENTION_DAYS)
+
+
+def changed_since(queryset, field, since, after, horizon):
+    """Строки, изменённые после (since, after), по порядку (field, id)."""
+    queryset = queryset.filter(**{f'{field}__lte': horizon})
+    if since is not None:
+        queryset = queryset.filter(
+            Q(**{f'{field}__gt': since})
+            | Q(**{field: since, 'id__gt': after})
+        )
+    return queryset.order_by(field, 'id')
+
+
+def deleted_ids(model, since, until, user_id=None):
+    if since is None:
+        return set()
+    return set(Tombstone.objects.filter(
+        model=model._meta.label,
+        user_id=user_id,
+        deleted__gt=since,
+        deleted__lte=until
+    ).values_list('object_id', flat=True))
+
+
+def collection_changes(queryset, field, user_id, since, horizon):
+    """Что добавилось в список пользователя и что из него пропало.
+
+    Если запись удалили и добавили снова, она есть только в added, если
+    добавили и удалили — только в removed.
+    """
+    rows = queryset.filter(created__lte=horizon)
+    added = rows if since is None else rows.filter(created__gt=since)
+    removed = deleted_ids(queryset.model, since, horizon, user_id)
+    if removed:
+        removed -= set(rows.filter(
+            **{f'{field}__in': removed}
+        ).values_list(field, flat=True))
+    return {
+        'added': sorted(added.values_list(field, flat=True)),
+        'removed': sorted(removed),
+    }
+
+
+def next_link(request, since, after=None):
+    url = replace_query_param(
+        request.build_absolute_uri(),
+        'updated_since',
+        serializers.DateTimeField().to_representation(since)
+    )
+    if after is None:
+        return remove_query_param(url, 'after')
+    return replace_query_param(url, 'after', after)
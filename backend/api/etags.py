@@ -0,0 +1,51 @@
+import hashlib
+import uuid
+
+from django.core.cache import cache
+from django.utils.http import parse_etags
+
+from .utils import invalidated_cache_timeout  # isort:skip
+
+USER_STATE_KEY = 'user_state_version_%s'
+
+
+def get_user_state_version(user):
+    if user.is_anonymous:
+        return 'anonymous'
+    key = USER_STATE_KEY % user.pk
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, invalidated_cache_timeout())
+        version = cache.get(key)
+    return version
+
+
+def bump_user_state_version(user_id):
+    cache.set(USER_STATE_KEY % user_id, uuid.uuid4().hex,
+              invalidated_cache_timeout())
+
+
+def make_etag(request, versions):
+    """Строгий ETag ответа по версиям рецептов и состоянию пользователя."""
+    digest = hashlib.sha1()
+    for part in (
+        request.get_full_path(),
+        getattr(request, 'accepted_media_type', ''),
+        get_user_state_version(request.user),
+        *versions
+    ):
+        digest.update(str(part).encode())
+        digest.update(b'\0')
+    return '"%s"' % digest.hexdigest()
+
+
+def etag_matches(request, etag):
+    header = request.META.get('HTTP_IF_NONE_MATCH')
+    if not header:
+        return False
+    etags = parse_etags(header)
+    if '*' in etags:
+        return True
+    return etag in (
+        value[2:] if value.startswith('W/') else value for value in etags
+    )
@@ -0,0 +1,112 @@
+import hashlib
+
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.utils.http import urlencode
+from rest_framework.exceptions import ValidationError
+
+from recipes.models import Recipe  # isort:skip
+from .feed_cache import get_feed_version  # isort:skip
+from .filters import RecipeFilters  # isort:skip
+from .metrics import record_cache  # isort:skip
+
+COOKING_TIME_BUCKETS = (
+    ('0-15', 0, 15),
+    ('15-30', 15, 30),
+    ('30-60', 30, 60),
+    ('60+', 60, None),
+)
+AUTHORS_LIMIT = 20
+FACETS_KEY = 'recipe_facets_%s'
+FACETS_CACHE_TTL = 300
+# Зависят от пользователя, а версия ленты при их изменении не меняется.
+USER_FILTERS = ('is_favorited', 'is_in_shopping_cart')
+
+
+def filtered_recipes(request, exclude=None):
+    """Рецепты с текущими фильтрами, кроме фильтра самого фасета."""
+    data = request.query_params.copy()
+    data.pop('ordering', None)
+    if exclude:
+        data.pop(exclude, None)
+    filterset = RecipeFilters(
+        data,
+        queryset=Recipe.objects.all(),
+        request=request
+    )
+    if not filterset.is_valid():
+        raise ValidationError(filterset.errors)
+    return filterset.qs.order_by()
+
+
+def cooking_time_facet(recipes):
+    aggregates = {'count': Count('id')}
+    for label, low, high in COOKING_TIME_BUCKETS:
+        condition = Q(cooking_time__gte=low)
+        if high is not None:
+            condition &= Q(cooking_time__lt=high)
+        aggregates[label] = Count('id', filter=condition)
+    totals = recipes.aggregate(**aggregates)
+    return totals.pop('count'), [
+        {'bucket': label, 'count': totals[label]}
+        for label, _, _ in COOKING_TIME_BUCKETS
+    ]
+
+
+def tags_facet(recipes):
+    tags = Recipe.tags.through.objects.filter(
+        recipe_id__in=recipes.values('id')
+    ).values('tag_id', 'tag__slug', 'tag__name').annotate(
+        count=Count('recipe_id')
+    ).order_by('-count', 'tag__slug')
+    return [
+        {'id': tag['tag_id'], 'slug': tag['tag__slug'],
+         'name': tag['tag__name'], 'count': tag['count']}
+        for tag in tags
+    ]
+
+
+def authors_facet(recipes):
+    authors = recipes.values('author_id', 'author__username').annotate(
+        count=Count('id')
+    ).order_by('-count', 'author_id')[:AUTHORS_LIMIT]
+    return [
+        {'id': author['author_id'], 'username': author['author__username'],
+         'count': author['count']}
+        for author in authors
+    ]
+
+
+def facets_cache_key(request):
+    """Ключ по версии ленты и фильтрам или None для личных фильтров."""
+    params = request.query_params
+    if any(params.get(name) for name in USER_FILTERS):
+        return None
+    query = urlencode(sorted(
+        (name, sorted(params.getlist(name))) for name in params
+        if name in RecipeFilters.base_filters and name != 'ordering'
+    ), doseq=True)
+    return FACETS_KEY % hashlib.sha1(
+        f'{get_feed_version()}?{query}'.encode()
+    ).hexdigest()
+
+
+def get_facets(request):
+    """Три агрегата по отфильтрованным рецептам, кэшируются до изменения
+    ленты: без кэша каждый запрос заново сканирует все рецепты."""
+    key = facets_cache_key(request)
+    if key is not None:
+        facets = cache.get(key)
+        record_cache('recipe_facets', facets is not None)
+        if facets is not None:
+            return facets
+    count, cooking_time = cooking_time_facet(filtered_recipes(request))
+    facets = {
+        'count': count,
+        'tags': tags_facet(filtered_recipes(request, exclude='tags')),
+        'cooking_time': cooking_time,
+        'authors': authors_facet(filtered_recipes(request, exclude='author')),
+    }
+    if key is not None:
+        cache.set(key, facets, FACETS_CACHE_TTL)
+    return facets
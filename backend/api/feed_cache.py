@@ -0,0 +1,154 @@
+import hashlib
+import logging
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connection, transaction
+from django.http import HttpResponse
+from django.utils.http import urlencode
+from rest_framework import status
+from rest_framework.response import Response
+
+from .etags import etag_matches  # isort:skip
+from .metrics import record_cache  # isort:skip
+from .utils import invalidated_cache_timeout  # isort:skip
+
+logger = logging.getLogger(__name__)
+
+FEED_VERSION_KEY = 'recipe_feed_version'
+FEED_KEY = 'recipe_feed_%s'
+FEED_LOCK_KEY = 'recipe_feed_lock_%s'
+FEED_PARAMS = frozenset(
+    ('page', 'limit', 'tags', 'author', 'ordering', 'fields', 'omit', 'flags')
+)
+WAIT_INTERVAL = 0.05
+
+
+def feed_cache_key(request):
+    """Ключ кэша ленты или None, если ответ не кэшируется.
+
+    Кэшируются только первые страницы для анонимов: остальное
+    запрашивают редко, и оно лишь вытесняло бы популярные ключи.
+    """
+    if (request.method not in ('GET', 'HEAD')
+            or not request.user.is_anonymous
+            or request.accepted_renderer.format != 'json'):
+        return None
+    params = request.query_params
+    if not FEED_PARAMS.issuperset(params):
+        return None
+    try:
+        page = int(params.get('page', 1))
+    except ValueError:
+        return None
+    if page > settings.FEED_CACHE_MAX_PAGE:
+        return None
+    query = urlencode(
+        sorted((name, sorted(params.getlist(name))) for name in params),
+        doseq=True
+    )
+    return FEED_KEY % hashlib.sha1(
+        f'{request.path}?{query}'.encode()
+    ).hexdigest()
+
+
+def get_feed_version():
+    version = cache.get(FEED_VERSION_KEY)
+    if version is None:
+        cache.add(FEED_VERSION_KEY, uuid.uuid4().hex,
+                  invalidated_cache_timeout())
+        version = cache.get(FEED_VERSION_KEY)
+    return version
+
+
+def invalidate_feed_cache():
+    """Старые записи остаются в кэше и отдаются, пока их пересчитывают."""
+    cache.set(FEED_VERSION_KEY, uuid.uuid4().hex,
+              invalidated_cache_timeout())
+
+
+def get_cached_feed(key, render):
+    """stale-while-revalidate с одним пересчётом ключа на все воркеры.
+
+    render возвращает (content, content_type, etag). Свежую запись
+    отдаёт сразу. Устаревшую пересчитывает только воркер, взявший
+    блокировку, остальные тем временем отдают старую. Если пересчёт
+    упал на базе, тоже отдаётся старая запись.
+    """
+    version = get_feed_version()
+    entry = cache.get(key)
+    if (entry is not None and entry['version'] == version
+            and time.time() - entry['created'] < settings.FEED_CACHE_TTL):
+        record_cache('recipe_feed', True)
+        return entry
+    lock = FEED_LOCK_KEY % key
+    token = uuid.uuid4().hex
+    acquired = cache.add(lock, token, settings.FEED_CACHE_LOCK_TIMEOUT)
+    if not acquired:
+        if entry is None:
+            entry = wait_for_entry(key)
+        if entry is not None:
+            record_cache('recipe_feed', True)
+            return entry
+    record_cache('recipe_feed', False)
+    try:
+        return refresh_entry(key, version, render, entry is not None)
+    except DatabaseError:
+        if entry is None:
+            raise
+        logger.warning('Лента отдана из кэша: ошибка базы при пересчёте',
+                       exc_info=True)
+        return entry
+    finally:
+        # Чужую блокировку не снимаем: её воркер ещё считает запись. Своя
+        # могла истечь за долгий пересчёт и достаться другому воркеру.
+        if acquired and cache.get(lock) == token:
+            cache.delete(lock)
+
+
+def wait_for_entry(key):
+    deadline = time.time() + settings.FEED_CACHE_LOCK_TIMEOUT
+    while time.time() < deadline:
+        time.sleep(WAIT_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry
+        if cache.get(FEED_LOCK_KEY % key) is None:
+            return None
+    return None
+
+
+def refresh_entry(key, version, render, has_stale):
+    with transaction.atomic():
+        # Когда есть что отдать взамен, медленный запрос лучше прервать.
+        if has_stale and connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SET LOCAL statement_timeout = %s',
+                    [settings.FEED_CACHE_DB_TIMEOUT]
+                )
+        content, content_type, etag = render()
+    entry = {
+        'version': version,
+        'created': time.time(),
+        'content': content,
+        'content_type': content_type,
+        'etag': etag,
+    }
+    cache.set(key, entry, settings.FEED_CACHE_STALE_TTL)
+    return entry
+
+
+def feed_response(request, entry):
+    etag = entry['etag']
+    headers = {'ETag': etag} if etag else {}
+    if etag and etag_matches(request, etag):
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response = HttpResponse(entry['content'],
+                            content_type=entry['content_type'])
+    for name, value in headers.items():
+        response[name] = value
+    response['Age'] = int(time.time() - entry['created'])
+    return response
@@ -1,28 +1,80 @@
+from django.core.cache import cache
 from django_filters.rest_framework import FilterSet, filters
 
-from recipes.models import Recipe, Ingredient  # isort:skip
+from recipes.models import (Cart, Favorite, Ingredient,  # isort:skip
+                            Recipe, Tag)
+from .metrics import record_cache  # isort:skip
+from .utils import invalidated_cache_timeout  # isort:skip
+
+TAG_SLUGS_KEY = 'tag_slug_map'
+
+ORDERINGS = {
+    'popular': ('-popularity', '-id'),
+    'trending': ('-trending', '-id'),
+    'cooking_time': ('cooking_time', '-id'),
+}
+
+
+def get_tag_slug_map():
+    slugs = cache.get(TAG_SLUGS_KEY)
+    record_cache('tag_slug_map', slugs is not None)
+    if slugs is None:
+        slugs = dict(Tag.objects.values_list('slug', 'id'))
+        cache.set(TAG_SLUGS_KEY, slugs, invalidated_cache_timeout())
+    return slugs
+
+
+def invalidate_tag_slug_map():
+    cache.delete(TAG_SLUGS_KEY)
+
+
+def tag_choices():
+    return [(slug, slug) for slug in get_tag_slug_map()]
 
 
 class RecipeFilters(FilterSet):
-    tags = filters.AllValuesMultipleFilter(field_name='tags__slug')
+    tags = filters.MultipleChoiceFilter(
+        choices=tag_choices,
+        method='filter_tags'
+    )
     is_favorited = filters.BooleanFilter(method='filter_is_favorited')
     is_in_shopping_cart = filters.BooleanFilter(
         method='filter_is_in_shopping_cart'
     )
+    ordering = filters.ChoiceFilter(
+        choices=[(ordering, ordering) for ordering in ORDERINGS],
+        method='filter_ordering'
+    )
 
     class Meta:
         model = Recipe
-        fields = ('author', 'tags', 'is_favorited', 'is_in_shopping_cart')
+        fields = ('author', 'tags', 'is_favorited', 'is_in_shopping_cart',
+                  'ordering')
+
+    def filter_tags(self, queryset, name, value):
+        slugs = get_tag_slug_map()
+        recipes = Recipe.tags.through.objects.filter(
+            tag_id__in=[slugs[slug] for slug in value if slug in slugs]
+        ).values('recipe_id')
+        return queryset.filter(id__in=recipes)
+
+    def filter_ordering(self, queryset, name, value):
+        return queryset.order_by(*ORDERINGS[value])
 
     def filter_is_favorited(self, queryset, name, value):
-        if value:
-            return queryset.filter(favorites__user=self.request.user)
-        return queryset
+        return self.filter_user_related(queryset, Favorite, value)
 
     def filter_is_in_shopping_cart(self, queryset, name, value):
-        if value:
-            return queryset.filter(carts__user=self.request.user)
-        return queryset
+        return self.filter_user_related(queryset, Cart, value)
+
+    def filter_user_related(self, queryset, model, value):
+        if not value:
+            return queryset
+        if self.request.user.is_anonymous:
+            return queryset.none()
+        return queryset.filter(id__in=model.objects.filter(
+            user=self.request.user
+        ).values('recipe_id'))
 
 
 class IngredientSearchFilter(FilterSet):
@@ -0,0 +1,56 @@
+import time
+import zlib
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.renderers import FastJSONRenderer, orjson  # isort:skip
+from api.middleware import brotli  # isort:skip
+from api.serializers import RecipeSerializers  # isort:skip
+from recipes.models import Recipe  # isort:skip
+
+
+class Command(BaseCommand):
+    help = 'benchmark rendering and compression of a recipe list page'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', default=100, type=int,
+                            help='recipes on the page')
+        parser.add_argument('--repeat', default=50, type=int,
+                            help='render iterations per renderer')
+
+    def handle(self, *args, **options):
+        request = Request(APIRequestFactory().get('/api/recipes/'))
+        recipes = Recipe.objects.select_related('author').prefetch_related(
+            'tags', 'ingredientamount__ingredient'
+        )[:options['size']]
+        if not recipes.exists():
+            raise CommandError('В базе нет рецептов')
+        data = RecipeSerializers(
+            list(recipes), many=True, context={'request': request}
+        ).data
+        while len(data) < options['size']:
+            data = data + data
+        data = {'count': len(data), 'next': None, 'previous': None,
+                'results': data[:options['size']]}
+        self.stdout.write(f'orjson: {"yes" if orjson else "no"}, '
+                          f'brotli: {"yes" if brotli else "no"}')
+        for renderer in (JSONRenderer(), FastJSONRenderer()):
+            started = time.perf_counter()
+            for _ in range(options['repeat']):
+                content = renderer.render(data)
+            elapsed = (time.perf_counter() - started) / options['repeat']
+            self.stdout.write(f'{type(renderer).__name__}: '
+                              f'{elapsed * 1000:.2f} ms, {len(content)} B')
+        started = time.perf_counter()
+        gzipped = zlib.compress(content, 6)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f'gzip: {elapsed * 1000:.2f} ms, {len(gzipped)} B')
+        if brotli is not None:
+            started = time.perf_counter()
+            compressed = brotli.compress(content, quality=4)
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f'brotli: {elapsed * 1000:.2f} ms, '
+                              f'{len(compressed)} B')
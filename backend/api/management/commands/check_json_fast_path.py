@@ -0,0 +1,81 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.test.utils import override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api.views import RecipeViewSet  # isort:skip
+
+User = get_user_model()
+
+
+def signature(response):
+    return response.status_code, response['Content-Type'], response.content
+
+
+class Command(BaseCommand):
+    help = ('compare recipe responses built by the database with '
+            'the serializer output byte for byte')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', default=5, type=int,
+                            help='most active users to check besides '
+                                 'the anonymous one')
+        parser.add_argument('--pages', default=3, type=int)
+        parser.add_argument('--limit', default=6, type=int)
+
+    def handle(self, *args, **options):
+        self.factory = APIRequestFactory()
+        self.list_view = RecipeViewSet.as_view({'get': 'list'},
+                                               throttle_classes=())
+        self.detail_view = RecipeViewSet.as_view({'get': 'retrieve'},
+                                                 throttle_classes=())
+        users = [AnonymousUser(), *User.objects.annotate(
+            activity=Count('favorites') + Count('carts')
+        ).order_by('-activity')[:options['users']]]
+        checked = mismatches = 0
+        for user in users:
+            for page in range(1, options['pages'] + 1):
+                for ordering in ('', 'popular'):
+                    path = (f'/api/recipes/?page={page}'
+                            f'&limit={options["limit"]}&ordering={ordering}')
+                    results = self.compare(user, path, self.list_view)
+                    checked += 1
+                    if results is None:
+                        mismatches += 1
+                        continue
+                    for recipe_id in results:
+                        checked += 1
+                        if self.compare(user, f'/api/recipes/{recipe_id}/',
+                                        self.detail_view,
+                                        pk=str(recipe_id)) is None:
+                            mismatches += 1
+        self.stdout.write(f'Проверено ответов: {checked}, '
+                          f'расхождений: {mismatches}')
+        if mismatches:
+            raise CommandError('Ответы быстрого пути отличаются')
+
+    def get(self, user, path, view, fast, **kwargs):
+        request = self.factory.get(path, HTTP_ACCEPT='application/json')
+        if user.is_authenticated:
+            force_authenticate(request, user=user)
+        # Кэш ленты отдал бы второму запросу байты первого.
+        with override_settings(RECIPE_JSON_FAST_PATH=fast,
+                               FEED_CACHE_MAX_PAGE=0):
+            response = view(request, **kwargs)
+            if hasattr(response, 'render'):
+                response.render()
+        return response
+
+    def compare(self, user, path, view, **kwargs):
+        """Идентификаторы рецептов из ответа или None при расхождении."""
+        expected = self.get(user, path, view, False, **kwargs)
+        actual = self.get(user, path, view, True, **kwargs)
+        if signature(expected) == signature(actual):
+            data = expected.data if expected.status_code == 200 else {}
+            return [recipe['id'] for recipe in data.get('results', ())]
+        self.stderr.write(f'{user} {path}:\n'
+                          f'  сериализатор: {expected.content[:300]}\n'
+                          f'  база:         {actual.content[:300]}')
+        return None
@@ -0,0 +1,31 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from api.deletion import delete_recipes, delete_users  # isort:skip
+from recipes.models import Recipe  # isort:skip
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'delete users or recipes with related rows in small batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', nargs='+', type=int, default=(),
+                            metavar='ID')
+        parser.add_argument('--recipes', nargs='+', type=int, default=(),
+                            metavar='ID')
+
+    def handle(self, *args, **options):
+        if not options['users'] and not options['recipes']:
+            raise CommandError('Укажите --users или --recipes')
+        if options['recipes']:
+            delete_recipes(Recipe.objects.filter(pk__in=options['recipes']),
+                           progress=self.progress)
+        if options['users']:
+            delete_users(User.objects.filter(pk__in=options['users']),
+                         progress=self.progress)
+
+    def progress(self, model, deleted):
+        self.stdout.write(f'{model._meta.verbose_name_plural}: '
+                          f'удалено {deleted}')
@@ -0,0 +1,91 @@
+import json
+import tarfile
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db.models import Prefetch
+
+from recipes.models import IngredientAmount, Recipe  # isort:skip
+
+
+class Command(BaseCommand):
+    help = 'export recipes to ndjson and images to a tar archive'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', type=str)
+        parser.add_argument('--media', type=str,
+                            help='tar archive for recipe images')
+        parser.add_argument('--batch-size', default=1000, type=int)
+
+    def handle(self, *args, **options):
+        archive = None
+        if options['media']:
+            archive = tarfile.open(options['media'], 'w')
+        exported = 0
+        try:
+            with open(options['path'], 'w', encoding='utf-8') as output:
+                for recipe in self.recipes(options['batch_size']):
+                    output.write(json.dumps(
+                        self.serialize(recipe),
+                        ensure_ascii=False
+                    ) + '\n')
+                    if archive is not None and recipe.image:
+                        self.add_image(archive, recipe.image.name)
+                    exported += 1
+        finally:
+            if archive is not None:
+                archive.close()
+        self.stdout.write(f'Экспортировано рецептов: {exported}')
+
+    def recipes(self, batch_size):
+        queryset = Recipe.objects.select_related('author').prefetch_related(
+            'tags',
+            Prefetch(
+                'ingredientamount',
+                IngredientAmount.objects.select_related(
+                    'ingredient'
+                ).order_by('id')
+            )
+        ).order_by('id')
+        last_id = 0
+        while True:
+            batch = list(queryset.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                return
+            yield from batch
+            last_id = batch[-1].id
+
+    def serialize(self, recipe):
+        return {
+            'name': recipe.name,
+            'text': recipe.text,
+            'cooking_time': recipe.cooking_time,
+            'image': recipe.image.name,
+            'author': {
+                'username': recipe.author.username,
+                'email': recipe.author.email,
+                'first_name': recipe.author.first_name,
+                'last_name': recipe.author.last_name,
+            },
+            'tags': [
+                {'name': tag.name, 'color': tag.color, 'slug': tag.slug}
+                for tag in recipe.tags.all()
+            ],
+            'ingredients': [
+                {
+                    'name': amount.ingredient.name,
+                    'measurement_unit': amount.ingredient.measurement_unit,
+                    'amount': amount.amount,
+                }
+                for amount in recipe.ingredientamount.all()
+            ],
+        }
+
+    def add_image(self, archive, name):
+        if not default_storage.exists(name):
+            self.stderr.write(f'Картинка {name} не найдена')
+            return
+        info = tarfile.TarInfo(name)
+        info.size = default_storage.size(name)
+        with default_storage.open(name, 'rb') as image:
+            archive.addfile(info, image)
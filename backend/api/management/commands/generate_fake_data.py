@@ -0,0 +1,267 @@
+import random
+import uuid
+from io import BytesIO
+from itertools import accumulate
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from PIL import Image
+
+from api.feed_cache import invalidate_feed_cache  # isort:skip
+from api.filters import invalidate_tag_slug_map  # isort:skip
+from api.pantry import invalidate_pantry_index  # isort:skip
+from api.popularity import rebuild_popularity  # isort:skip
+from recipes.models import (Cart, Favorite, Ingredient,  # isort:skip
+                            IngredientAmount, Recipe, Tag)
+from users.models import Follow  # isort:skip
+
+User = get_user_model()
+
+WORDS = (
+    'суп', 'салат', 'пирог', 'каша', 'рагу', 'запеканка', 'омлет', 'паста',
+    'блины', 'котлеты', 'плов', 'борщ', 'соус', 'десерт', 'гратен', 'тушёный',
+    'печёный', 'домашний', 'быстрый', 'острый', 'сливочный', 'овощной',
+    'куриный', 'грибной', 'сырный', 'летний', 'зимний', 'бабушкин',
+)
+IMAGE_SIZE = (64, 64)
+IMAGE_PATH = 'recipes/fake/fake_%s.png'
+
+
+def power_law_weights(size, alpha):
+    """Накопленные веса Ципфа для случайного порядка элементов."""
+    ranks = list(range(1, size + 1))
+    random.shuffle(ranks)
+    return list(accumulate(1 / rank ** alpha for rank in ranks))
+
+
+class Command(BaseCommand):
+    help = 'fill the database with synthetic data for load testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', default=1000, type=int)
+        parser.add_argument('--recipes', default=10000, type=int)
+        parser.add_argument('--tags', default=10, type=int,
+                            help='minimal number of tags')
+        parser.add_argument('--ingredients', default=1000, type=int,
+                            help='minimal number of ingredients')
+        parser.add_argument('--ingredients-per-recipe', default=(3, 12),
+                            nargs=2, type=int, metavar=('MIN', 'MAX'))
+        parser.add_argument('--favorites', default=50000, type=int)
+        parser.add_argument('--carts', default=10000, type=int)
+        parser.add_argument('--follows', default=20000, type=int)
+        parser.add_argument('--images', default=8, type=int,
+                            help='size of the recipe image pool')
+        parser.add_argument('--alpha', default=1.1, type=float,
+                            help='power-law exponent for authors, followed '
+                                 'users and recipe popularity')
+        parser.add_argument('--batch-size', default=5000, type=int)
+        parser.add_argument('--seed', type=int)
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        self.alpha = options['alpha']
+        self.batch_size = options['batch_size']
+        self.create_users(options['users'])
+        self.create_tags(options['tags'])
+        self.create_ingredients(options['ingredients'])
+        user_ids = list(User.objects.values_list('id', flat=True))
+        if not user_ids:
+            self.stdout.write('Нет пользователей, рецепты не созданы')
+            return
+        self.user_weights = power_law_weights(len(user_ids), self.alpha)
+        self.create_recipes(
+            options['recipes'],
+            user_ids,
+            self.image_pool(options['images']),
+            *options['ingredients_per_recipe']
+        )
+        recipe_ids = list(Recipe.objects.values_list('id', flat=True))
+        if recipe_ids:
+            recipe_weights = power_law_weights(len(recipe_ids), self.alpha)
+            for model, count in ((Favorite, options['favorites']),
+                                 (Cart, options['carts'])):
+                self.create_pairs(
+                    model, 'recipe_id', count,
+                    user_ids, recipe_ids, recipe_weights
+                )
+        if len(user_ids) > 1:
+            self.create_pairs(
+                Follow, 'following_id', options['follows'],
+                user_ids, user_ids, self.user_weights, exclude_self=True
+            )
+        self.stdout.write('Пересчёт популярности рецептов')
+        rebuild_popularity()
+        invalidate_tag_slug_map()
+        invalidate_pantry_index()
+        invalidate_feed_cache()
+        for model in (User, Tag, Ingredient, Recipe, IngredientAmount,
+                      Favorite, Cart, Follow):
+            self.stdout.write(
+                f'{model._meta.verbose_name_plural}: '
+                f'{model.objects.count()}'
+            )
+
+    def batches(self, total):
+        for start in range(0, total, self.batch_size):
+            yield start, min(self.batch_size, total - start)
+
+    def create_users(self, total):
+        # Хеш пароля считается один раз: PBKDF2 на каждого пользователя
+        # занял бы больше времени, чем вся остальная генерация.
+        password = make_password('fake-password')
+        run = uuid.uuid4().hex[:8]
+        for start, size in self.batches(total):
+            with transaction.atomic():
+                User.objects.bulk_create([
+                    User(
+                        username=f'fake_{run}_{number}',
+                        email=f'fake_{run}_{number}@example.com',
+                        first_name=random.choice(WORDS).capitalize(),
+                        last_name=random.choice(WORDS).capitalize(),
+                        password=password
+                    )
+                    for number in range(start, start + size)
+                ])
+            self.stdout.write(f'Пользователей создано: {start + size}')
+
+    def create_tags(self, minimum):
+        missing = minimum - Tag.objects.count()
+        if missing <= 0:
+            return
+        run = uuid.uuid4().hex[:8]
+        colors = set(Tag.objects.values_list('color', flat=True))
+        tags = []
+        while len(tags) < missing:
+            color = '#%06X' % random.randrange(0x1000000)
+            if color in colors:
+                continue
+            colors.add(color)
+            tags.append(Tag(
+                name=f'Тег {run} {len(tags)}',
+                slug=f'fake-{run}-{len(tags)}',
+                color=color
+            ))
+        Tag.objects.bulk_create(tags)
+
+    def create_ingredients(self, minimum):
+        missing = minimum - Ingredient.objects.count()
+        if missing <= 0:
+            return
+        run = uuid.uuid4().hex[:8]
+        Ingredient.objects.bulk_create([
+            Ingredient(
+                name=f'{random.choice(WORDS)} {run} {number}',
+                measurement_unit=random.choice(('г', 'мл', 'шт.'))
+            )
+            for number in range(missing)
+        ])
+
+    def image_pool(self, size):
+        pool = []
+        for number in range(max(size, 1)):
+            name = IMAGE_PATH % number
+            if not default_storage.exists(name):
+                image = Image.new(
+                    'RGB', IMAGE_SIZE,
+                    tuple(random.randrange(256) for _ in range(3))
+                )
+                buffer = BytesIO()
+                image.save(buffer, 'PNG')
+                name = default_storage.save(
+                    name, ContentFile(buffer.getvalue())
+                )
+            pool.append(name)
+        return pool
+
+    def create_recipes(self, total, user_ids, images,
+                       min_ingredients, max_ingredients):
+        tag_ids = list(Tag.objects.values_list('id', flat=True))
+        ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+        ingredient_weights = power_law_weights(
+            len(ingredient_ids), self.alpha
+        )
+        max_ingredients = min(max_ingredients, len(ingredient_ids))
+        min_ingredients = min(min_ingredients, max_ingredients)
+        for start, size in self.batches(total):
+            authors = random.choices(
+                user_ids, cum_weights=self.user_weights, k=size
+            )
+            with transaction.atomic():
+                last_id = Recipe.objects.order_by('-id').values_list(
+                    'id', flat=True
+                ).first() or 0
+                Recipe.objects.bulk_create([
+                    Recipe(
+                        author_id=author_id,
+                        name=' '.join(random.sample(WORDS, 3)).capitalize(),
+                        text=' '.join(random.choices(WORDS, k=30)),
+                        image=random.choice(images),
+                        cooking_time=random.randint(5, 180)
+                    )
+                    for author_id in authors
+                ])
+                # SQLite не возвращает id из bulk_create, поэтому новые
+                # рецепты берутся по id больше последнего существовавшего.
+                recipe_ids = Recipe.objects.filter(
+                    id__gt=last_id
+                ).values_list('id', flat=True)
+                amounts = []
+                recipe_tags = []
+                for recipe_id in recipe_ids:
+                    count = random.randint(min_ingredients, max_ingredients)
+                    chosen = set()
+                    while len(chosen) < count:
+                        chosen.update(random.choices(
+                            ingredient_ids,
+                            cum_weights=ingredient_weights,
+                            k=count - len(chosen)
+                        ))
+                    amounts.extend(
+                        IngredientAmount(
+                            recipe_id=recipe_id,
+                            ingredient_id=ingredient_id,
+                            amount=random.randint(1, 500)
+                        )
+                        for ingredient_id in chosen
+                    )
+                    recipe_tags.extend(
+                        Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+                        for tag_id in random.sample(
+                            tag_ids, min(len(tag_ids), random.randint(1, 3))
+                        )
+                    )
+                IngredientAmount.objects.bulk_create(amounts)
+                Recipe.tags.through.objects.bulk_create(recipe_tags)
+            self.stdout.write(f'Рецептов создано: {start + size}')
+
+    def create_pairs(self, model, target_field, total, user_ids,
+                     target_ids, target_weights, exclude_self=False):
+        """Пары пользователь-объект: объекты выбираются по степенному закону.
+
+        Повторы внутри пачки отбрасываются, а с уже существующими
+        строками разбирается ignore_conflicts, поэтому строк может
+        получиться немного меньше запрошенного.
+        """
+        for start, size in self.batches(total):
+            targets = random.choices(
+                target_ids, cum_weights=target_weights, k=size
+            )
+            pairs = {
+                (user_id, target_id)
+                for user_id, target_id in zip(
+                    random.choices(user_ids, k=size), targets
+                )
+                if not exclude_self or user_id != target_id
+            }
+            with transaction.atomic():
+                model.objects.bulk_create([
+                    model(user_id=user_id, **{target_field: target_id})
+                    for user_id, target_id in pairs
+                ], ignore_conflicts=True)
+            self.stdout.write(
+                f'{model._meta.verbose_name_plural}: {start + size}'
+            )
@@ -0,0 +1,202 @@
+import json
+import posixpath
+import tarfile
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from api.feed_cache import invalidate_feed_cache  # isort:skip
+from api.filters import invalidate_tag_slug_map  # isort:skip
+from api.pantry import invalidate_pantry_index  # isort:skip
+from events.models import OutboxEvent  # isort:skip
+from events.signals import write_events  # isort:skip
+from recipes.models import (Ingredient, IngredientAmount,  # isort:skip
+                            Recipe, Tag)
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'import recipes from ndjson made by export_recipes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', type=str)
+        parser.add_argument('--media', type=str,
+                            help='tar archive with recipe images')
+        parser.add_argument('--batch-size', default=1000, type=int)
+
+    def handle(self, *args, **options):
+        images = {}
+        if options['media']:
+            images = self.extract_images(options['media'])
+        self.bulk_returns_ids = getattr(
+            connection.features,
+            'can_return_rows_from_bulk_insert',
+            getattr(connection.features,
+                    'can_return_ids_from_bulk_insert', False)
+        )
+        imported = 0
+        try:
+            with open(options['path'], encoding='utf-8') as source:
+                lines = (line for line in source if line.strip())
+                while True:
+                    batch = [
+                        json.loads(line)
+                        for line in islice(lines, options['batch_size'])
+                    ]
+                    if not batch:
+                        break
+                    with transaction.atomic():
+                        self.import_batch(batch, images)
+                    imported += len(batch)
+                    self.stdout.write(f'Импортировано рецептов: {imported}')
+        except FileNotFoundError:
+            raise CommandError(f'Файл {options["path"]} не найден')
+        transaction.on_commit(invalidate_tag_slug_map)
+        transaction.on_commit(invalidate_pantry_index)
+        transaction.on_commit(invalidate_feed_cache)
+
+    def extract_images(self, path):
+        images = {}
+        with tarfile.open(path, 'r|*') as archive:
+            for member in archive:
+                name = posixpath.normpath(member.name)
+                if not member.isfile() or name.startswith(('/', '..')):
+                    continue
+                images[member.name] = default_storage.save(
+                    name,
+                    archive.extractfile(member)
+                )
+        return images
+
+    def import_batch(self, batch, images):
+        authors = self.resolve_authors(batch)
+        tags = self.resolve_tags(batch)
+        ingredients = self.resolve_ingredients(batch)
+        recipes = [
+            Recipe(
+                author=authors[item['author']['username']],
+                name=item['name'],
+                text=item['text'],
+                cooking_time=item['cooking_time'],
+                image=images.get(item['image'], item['image'])
+            )
+            for item in batch
+        ]
+        if self.bulk_returns_ids:
+            Recipe.objects.bulk_create(recipes)
+        else:
+            # raw: событие в outbox пишется ниже для всей пачки сразу.
+            # При raw auto_now не срабатывает, даты ставим сами.
+            now = timezone.now()
+            for recipe in recipes:
+                recipe.created = recipe.updated = now
+                recipe.save_base(raw=True)
+        amounts = IngredientAmount.objects.bulk_create([
+            IngredientAmount(
+                recipe=recipe,
+                ingredient_id=ingredients[
+                    ingredient['name'], ingredient['measurement_unit']
+                ],
+                amount=ingredient['amount']
+            )
+            for recipe, item in zip(recipes, batch)
+            for ingredient in item['ingredients']
+        ])
+        if not self.bulk_returns_ids:
+            # Рецепты в пачке новые, других строк у них нет.
+            amounts = IngredientAmount.objects.filter(recipe__in=recipes)
+        Recipe.tags.through.objects.bulk_create([
+            Recipe.tags.through(recipe=recipe, tag_id=tags[tag['slug']])
+            for recipe, item in zip(recipes, batch)
+            for tag in item['tags']
+        ])
+        write_events(recipes, OutboxEvent.CREATED)
+        write_events(amounts, OutboxEvent.CREATED)
+
+    def resolve_authors(self, batch):
+        authors = {item['author']['username']: item['author']
+                   for item in batch}
+        existing = self.existing_authors(authors.values())
+        missing = [
+            User(password=make_password(None), **author)
+            for username, author in authors.items()
+            if username not in existing
+        ]
+        if missing:
+            User.objects.bulk_create(missing, ignore_conflicts=True)
+            existing = self.existing_authors(authors.values())
+        return {
+            username: existing.get(username) or existing[author['email']]
+            for username, author in authors.items()
+        }
+
+    def existing_authors(self, authors):
+        users = User.objects.filter(
+            Q(username__in=[author['username'] for author in authors])
+            | Q(email__in=[author['email'] for author in authors])
+        )
+        existing = {}
+        for user in users:
+            existing[user.username] = user
+            existing[user.email] = user
+        return existing
+
+    def resolve_tags(self, batch):
+        tags = {tag['slug']: tag for item in batch for tag in item['tags']}
+        existing = dict(
+            Tag.objects.filter(slug__in=tags).values_list('slug', 'id')
+        )
+        missing = [Tag(**tag) for slug, tag in tags.items()
+                   if slug not in existing]
+        if missing:
+            Tag.objects.bulk_create(missing, ignore_conflicts=True)
+            existing = dict(
+                Tag.objects.filter(slug__in=tags).values_list('slug', 'id')
+            )
+            write_events(
+                Tag.objects.filter(slug__in=[tag.slug for tag in missing]),
+                OutboxEvent.CREATED
+            )
+        # Тег не вставлен, если его название или цвет уже занят другим.
+        conflicts = sorted(tags.keys() - existing.keys())
+        if conflicts:
+            raise CommandError(
+                'Название или цвет тегов уже заняты другими тегами: '
+                f'{", ".join(conflicts)}'
+            )
+        return existing
+
+    def resolve_ingredients(self, batch):
+        keys = {
+            (ingredient['name'], ingredient['measurement_unit'])
+            for item in batch for ingredient in item['ingredients']
+        }
+        existing = self.existing_ingredients(keys)
+        missing = [
+            Ingredient(name=name, measurement_unit=measurement_unit)
+            for name, measurement_unit in keys - existing.keys()
+        ]
+        if missing:
+            Ingredient.objects.bulk_create(missing)
+            existing = self.existing_ingredients(keys)
+            write_events(Ingredient.objects.filter(pk__in=[
+                existing[ingredient.name, ingredient.measurement_unit]
+                for ingredient in missing
+            ]), OutboxEvent.CREATED)
+        return existing
+
+    def existing_ingredients(self, keys):
+        existing = {}
+        ingredients = Ingredient.objects.filter(
+            name__in={name for name, _ in keys}
+        ).order_by('id').values_list('name', 'measurement_unit', 'id')
+        for name, measurement_unit, ingredient_id in ingredients:
+            existing.setdefault((name, measurement_unit), ingredient_id)
+        return existing
@@ -0,0 +1,232 @@
+import http.client
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import quote
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.authtoken.models import Token
+
+from recipes.models import Ingredient, Recipe, Tag  # isort:skip
+
+User = get_user_model()
+
+SCENARIOS = (
+    ('browse', 30),
+    ('detail', 15),
+    ('filter', 15),
+    ('ingredients', 10),
+    ('favorite', 10),
+    ('cart', 8),
+    ('subscribe', 7),
+    ('download', 5),
+)
+LOCK_ERRORS = re.compile(
+    r'database is locked|deadlock detected|could not obtain lock'
+    r'|could not serialize access|lock timeout',
+    re.IGNORECASE
+)
+
+
+def percentile(values, percent):
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+class SimulatedUser:
+
+    def __init__(self, host, port, token, data):
+        self.connection = http.client.HTTPConnection(host, port, timeout=30)
+        self.headers = {'Authorization': f'Token {token}',
+                        'Content-Type': 'application/json'}
+        self.data = data
+
+    def request(self, method, path):
+        started = time.perf_counter()
+        try:
+            self.connection.request(method, path, headers=self.headers)
+            response = self.connection.getresponse()
+            response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            self.connection.close()
+            status = 0
+        return status, time.perf_counter() - started
+
+    def run(self, scenario):
+        data = self.data
+        recipe_id = random.choice(data['recipes'])
+        if scenario == 'browse':
+            page = random.randint(1, data['pages'])
+            return [self.request('GET', f'/api/recipes/?page={page}')]
+        if scenario == 'detail':
+            return [self.request('GET', f'/api/recipes/{recipe_id}/')]
+        if scenario == 'filter':
+            tag = random.choice(data['tags'])
+            flag = random.choice(('', '&is_favorited=1',
+                                  '&is_in_shopping_cart=1'))
+            return [self.request('GET', f'/api/recipes/?tags={tag}{flag}')]
+        if scenario == 'ingredients':
+            name = random.choice(data['ingredients'])[:2]
+            return [self.request(
+                'GET', f'/api/ingredients/?name={quote(name)}'
+            )]
+        if scenario in ('favorite', 'cart'):
+            action = 'favorite' if scenario == 'favorite' else 'shopping_cart'
+            path = f'/api/recipes/{recipe_id}/{action}/'
+            return [self.request('POST', path), self.request('DELETE', path)]
+        if scenario == 'subscribe':
+            path = f'/api/users/{random.choice(data["authors"])}/subscribe/'
+            return [self.request('POST', path), self.request('DELETE', path)]
+        return [self.request('GET', '/api/recipes/download_shopping_cart/')]
+
+
+class Command(BaseCommand):
+    help = 'run a weighted mixed workload against a local server'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--server', default='gunicorn',
+                            choices=('gunicorn', 'runserver'))
+        parser.add_argument('--workers', default='1,2,4', type=str,
+                            help='comma separated gunicorn worker counts')
+        parser.add_argument('--users', default=20, type=int,
+                            help='concurrent simulated users')
+        parser.add_argument('--duration', default=30, type=float,
+                            help='seconds per worker count')
+        parser.add_argument('--host', default='127.0.0.1', type=str)
+        parser.add_argument('--port', default=8765, type=int)
+
+    def handle(self, *args, **options):
+        data = self.prepare_data(options['users'])
+        workers = [int(count) for count in options['workers'].split(',')]
+        if options['server'] == 'runserver':
+            workers = workers[:1]
+        self.stdout.write(
+            f'{"workers":>7} {"rps":>8} {"p50 ms":>8} {"p95 ms":>8} '
+            f'{"p99 ms":>8} {"errors":>7} {"4xx":>7} {"locks":>6}'
+        )
+        for count in workers:
+            with tempfile.TemporaryFile() as log:
+                server = self.start_server(options, count, log)
+                try:
+                    self.wait_for_server(options['host'], options['port'])
+                    results = self.run_load(options, data)
+                finally:
+                    server.terminate()
+                    server.wait()
+                log.seek(0)
+                locks = len(LOCK_ERRORS.findall(
+                    log.read().decode('utf-8', 'replace')
+                ))
+            self.report(count, results, options['duration'], locks)
+
+    def prepare_data(self, users_count):
+        recipes = list(Recipe.objects.values_list('id', flat=True)[:1000])
+        if not recipes:
+            raise CommandError('В базе нет рецептов')
+        users = list(User.objects.order_by('id')[:users_count])
+        tokens = [Token.objects.get_or_create(user=user)[0].key
+                  for user in users]
+        return {
+            'tokens': tokens,
+            'recipes': recipes,
+            'pages': max(1, Recipe.objects.count() // 6),
+            'tags': list(Tag.objects.values_list('slug', flat=True)) or [''],
+            'ingredients': list(
+                Ingredient.objects.values_list('name', flat=True)[:500]
+            ) or ['а'],
+            'authors': list(Recipe.objects.values_list(
+                'author_id', flat=True
+            ).distinct()[:200]),
+        }
+
+    def start_server(self, options, workers, log):
+        bind = f'{options["host"]}:{options["port"]}'
+        if options['server'] == 'gunicorn':
+            command = ['gunicorn', 'foodgram.wsgi:application',
+                       '--bind', bind, '--workers', str(workers)]
+        else:
+            command = [sys.executable, 'manage.py', 'runserver', bind,
+                       '--noreload']
+        env = dict(os.environ, THROTTLE_USER_RATE='1000000/min',
+                   THROTTLE_ANON_RATE='1000000/min')
+        return subprocess.Popen(command, cwd=settings.BASE_DIR, env=env,
+                                stdout=log, stderr=subprocess.STDOUT)
+
+    def wait_for_server(self, host, port):
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            try:
+                connection = http.client.HTTPConnection(host, port, timeout=1)
+                connection.request('GET', '/api/tags/')
+                connection.getresponse().read()
+                return
+            except OSError:
+                time.sleep(0.2)
+        raise CommandError('Сервер не запустился')
+
+    def run_load(self, options, data):
+        results = defaultdict(list)
+        lock = threading.Lock()
+        deadline = time.monotonic() + options['duration']
+        names = [name for name, _ in SCENARIOS]
+        weights = [weight for _, weight in SCENARIOS]
+
+        def simulate(token):
+            user = SimulatedUser(options['host'], options['port'], token,
+                                 data)
+            local = defaultdict(list)
+            while time.monotonic() < deadline:
+                scenario = random.choices(names, weights)[0]
+                local[scenario].extend(user.run(scenario))
+            with lock:
+                for scenario, values in local.items():
+                    results[scenario].extend(values)
+
+        threads = [
+            threading.Thread(
+                target=simulate,
+                args=(data['tokens'][number % len(data['tokens'])],)
+            )
+            for number in range(options['users'])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def report(self, workers, results, duration, locks):
+        samples = [sample for values in results.values()
+                   for sample in values]
+        latencies = [latency * 1000 for _, latency in samples]
+        errors = sum(1 for status, _ in samples
+                     if status == 0 or status >= 500)
+        client_errors = sum(1 for status, _ in samples
+                            if 400 <= status < 500)
+        total = len(samples) or 1
+        self.stdout.write(
+            f'{workers:>7} {len(samples) / duration:>8.1f} '
+            f'{percentile(latencies, 50):>8.1f} '
+            f'{percentile(latencies, 95):>8.1f} '
+            f'{percentile(latencies, 99):>8.1f} '
+            f'{errors / total:>7.2%} {client_errors / total:>7.2%} '
+            f'{locks:>6}'
+        )
+        for scenario, values in sorted(results.items()):
+            scenario_latencies = [latency * 1000 for _, latency in values]
+            self.stdout.write(
+                f'{"":>7} {scenario:<12} {len(values):>6} req '
+                f'p50 {percentile(scenario_latencies, 50):.1f} ms '
+                f'p99 {percentile(scenario_latencies, 99):.1f} ms'
+            )
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from api.delta import get_oldest_since  # isort:skip
+from events.models import Tombstone  # isort:skip
+
+
+class Command(BaseCommand):
+    help = ('delete tombstones older than DELTA_SYNC_RETENTION_DAYS, '
+            'run it periodically')
+
+    def handle(self, *args, **options):
+        deleted, _ = Tombstone.objects.filter(
+            deleted__lt=get_oldest_since()
+        ).delete()
+        self.stdout.write(f'Удалено следов: {deleted}')
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from api.snapshots import SnapshotPublisher  # isort:skip
+
+
+class Command(BaseCommand):
+    help = 'render public API responses to static files served by nginx'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true',
+                            help='render everything into a new version')
+        parser.add_argument('--follow', action='store_true',
+                            help='keep publishing changes')
+        parser.add_argument('--interval', default=2.0, type=float,
+                            help='seconds between checks with --follow')
+
+    def handle(self, *args, **options):
+        publisher = SnapshotPublisher()
+        rebuild = options['rebuild']
+        while True:
+            written = publisher.publish(rebuild=rebuild)
+            rebuild = False
+            if written:
+                self.stdout.write(f'Обновлено файлов: {written}')
+            if not options['follow']:
+                return
+            time.sleep(options['interval'])
+            close_old_connections()
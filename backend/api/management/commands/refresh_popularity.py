@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from api.popularity import decay_popularity, rebuild_popularity  # isort:skip
+
+
+class Command(BaseCommand):
+    help = 'decay recipe popularity scores, run it periodically'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true',
+                            help='recompute scores from favorites and carts')
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            rebuild_popularity()
+        else:
+            decay_popularity()
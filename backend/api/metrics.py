@@ -0,0 +1,68 @@
+import os
+
+from django.http import HttpResponse
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY,
+                               CollectorRegistry, Counter, Histogram,
+                               generate_latest, multiprocess)
+
+REQUESTS = Counter(
+    'foodgram_http_requests_total',
+    'HTTP requests by route, method and status',
+    ('route', 'method', 'status')
+)
+LATENCY = Histogram(
+    'foodgram_http_request_duration_seconds',
+    'HTTP request latency by route',
+    ('route', 'method')
+)
+DB_QUERIES = Counter(
+    'foodgram_db_queries_total',
+    'Database queries by route',
+    ('route',)
+)
+DB_TIME = Counter(
+    'foodgram_db_query_seconds_total',
+    'Time spent in database queries by route',
+    ('route',)
+)
+DB_CONNECTIONS = Counter(
+    'foodgram_db_connections_total',
+    'Database connection checkouts: opened, reused, expired or broken',
+    ('result',)
+)
+DB_CONNECT_TIME = Histogram(
+    'foodgram_db_connect_seconds',
+    'Time spent opening and health-checking database connections',
+    ('stage',),
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+)
+CACHE = Counter(
+    'foodgram_cache_requests_total',
+    'Cache lookups by cache name and result',
+    ('cache', 'result')
+)
+AUTH_FAILURES = Counter(
+    'foodgram_auth_failures_total',
+    'Rejected requests by status',
+    ('status',)
+)
+EXPORT_SIZE = Histogram(
+    'foodgram_export_bytes',
+    'Size of generated exports',
+    ('export',),
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576)
+)
+
+
+def record_cache(name, hit):
+    CACHE.labels(name, 'hit' if hit else 'miss').inc()
+
+
+def metrics_view(request):
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return HttpResponse(generate_latest(registry),
+                        content_type=CONTENT_TYPE_LATEST)
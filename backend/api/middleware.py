@@ -0,0 +1,92 @@
+import re
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_string
+
+from .metrics import AUTH_FAILURES, DB_QUERIES, DB_TIME, LATENCY, REQUESTS
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+re_accepts_br = re.compile(r'\bbr\b')
+re_accepts_gzip = re.compile(r'\bgzip\b')
+
+
+class CompressionMiddleware:
+    """Сжимает ответы больше COMPRESSION_MIN_SIZE в brotli или gzip."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.min_size = getattr(settings, 'COMPRESSION_MIN_SIZE', 1024)
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (response.streaming
+                or response.has_header('Content-Encoding')
+                or len(response.content) < self.min_size):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        accept_encoding = request.META.get('HTTP_ACCEPT_ENCODING', '')
+        if brotli is not None and re_accepts_br.search(accept_encoding):
+            content = brotli.compress(response.content, quality=4)
+            encoding = 'br'
+        elif re_accepts_gzip.search(accept_encoding):
+            content = compress_string(response.content)
+            encoding = 'gzip'
+        else:
+            return response
+        if len(content) >= len(response.content):
+            return response
+        response.content = content
+        response['Content-Length'] = str(len(content))
+        response['Content-Encoding'] = encoding
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
+
+
+class QueryTracker:
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - started
+
+
+class MetricsMiddleware:
+    """Метрики запросов по имени маршрута для /metrics."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        tracker = QueryTracker()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(tracker))
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+        match = getattr(request, 'resolver_match', None)
+        route = match.view_name if match else 'unmatched'
+        REQUESTS.labels(route, request.method, response.status_code).inc()
+        LATENCY.labels(route, request.method).observe(duration)
+        DB_QUERIES.labels(route).inc(tracker.count)
+        DB_TIME.labels(route).inc(tracker.duration)
+        if response.status_code in (401, 403):
+            AUTH_FAILURES.labels(response.status_code).inc()
+        return response
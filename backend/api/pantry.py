@@ -0,0 +1,120 @@
+import threading
+import time
+import uuid
+from array import array
+from collections import Counter
+
+from django.core.cache import cache
+from django.db.models import Count, Max, Sum
+
+from recipes.models import IngredientAmount, Recipe  # isort:skip
+from .metrics import record_cache  # isort:skip
+
+PANTRY_VERSION_KEY = 'pantry_index_version'
+# Как часто воркер сверяет индекс с базой. Версия в кэше видна сразу
+# только при общем кэше, а с кэшем на процесс остальные воркеры узнают
+# об изменениях по этой сверке.
+PANTRY_RECHECK_INTERVAL = 10
+
+
+def get_fingerprint():
+    """Меняется при любом изменении рецептов, их тегов и ингредиентов.
+
+    Все такие изменения увеличивают Recipe.version, удаление уменьшает
+    число рецептов, а новый рецепт меняет максимальный id.
+    """
+    return tuple(Recipe.objects.aggregate(
+        Count('id'), Max('id'), Sum('version')
+    ).values())
+
+
+class PantryIndex:
+    """Инвертированный индекс ингредиент -> рецепты.
+
+    Для каждого ингредиента хранится отсортированный массив id рецептов,
+    поэтому подбор рецептов по продуктам не требует соединений в БД.
+    """
+
+    def __init__(self):
+        self.version = None
+        self.fingerprint = None
+        self.checked = 0
+        self.postings = {}
+        self.sizes = {}
+        self.cooking_time = {}
+        self.tags = {}
+        self.lock = threading.Lock()
+
+    def build(self, version, fingerprint):
+        postings = {}
+        sizes = Counter()
+        amounts = IngredientAmount.objects.order_by(
+            'recipe_id'
+        ).values_list('ingredient_id', 'recipe_id')
+        for ingredient_id, recipe_id in amounts.iterator():
+            postings.setdefault(ingredient_id, array('L')).append(recipe_id)
+            sizes[recipe_id] += 1
+        tags = {}
+        recipe_tags = Recipe.tags.through.objects.values_list(
+            'recipe_id', 'tag_id'
+        )
+        for recipe_id, tag_id in recipe_tags.iterator():
+            tags.setdefault(recipe_id, set()).add(tag_id)
+        self.cooking_time = dict(
+            Recipe.objects.order_by().values_list('id', 'cooking_time')
+        )
+        self.postings = postings
+        self.sizes = sizes
+        self.tags = tags
+        self.version = version
+        self.fingerprint = fingerprint
+        self.checked = time.monotonic()
+
+    def is_stale(self, version):
+        if self.version != version:
+            return True
+        if time.monotonic() - self.checked < PANTRY_RECHECK_INTERVAL:
+            return False
+        self.checked = time.monotonic()
+        return get_fingerprint() != self.fingerprint
+
+    def match(self, ingredient_ids, tag_ids=None, max_cooking_time=None):
+        matched = Counter()
+        for ingredient_id in set(ingredient_ids):
+            matched.update(self.postings.get(ingredient_id, ()))
+        results = []
+        for recipe_id, count in matched.items():
+            cooking_time = self.cooking_time.get(recipe_id)
+            if cooking_time is None:
+                continue
+            if max_cooking_time and cooking_time > max_cooking_time:
+                continue
+            if (tag_ids is not None
+                    and tag_ids.isdisjoint(self.tags.get(recipe_id, ()))):
+                continue
+            total = self.sizes[recipe_id]
+            results.append((recipe_id, count / total, total - count))
+        results.sort(key=lambda item: (-item[1], item[2], -item[0]))
+        return results
+
+
+_index = PantryIndex()
+
+
+def get_pantry_index():
+    version = cache.get(PANTRY_VERSION_KEY)
+    if version is None:
+        cache.add(PANTRY_VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(PANTRY_VERSION_KEY)
+    with _index.lock:
+        stale = _index.is_stale(version)
+        record_cache('pantry_index', not stale)
+        if stale:
+            # Отпечаток снимается до чтения таблиц: изменение во время
+            # сборки даст ещё одну пересборку, но не потеряется.
+            _index.build(version, get_fingerprint())
+    return _index
+
+
+def invalidate_pantry_index():
+    cache.set(PANTRY_VERSION_KEY, uuid.uuid4().hex, None)
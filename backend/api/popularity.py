@@ -0,0 +1,104 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from recipes.models import (Cart, Favorite,  # isort:skip
+                            PopularityDecay, Recipe)
+
+FAVORITE_WEIGHT = 2
+CART_WEIGHT = 1
+POPULARITY_HALF_LIFE_HOURS = 30 * 24
+TRENDING_HALF_LIFE_HOURS = 2 * 24
+POPULARITY_WEIGHTS = {Favorite: FAVORITE_WEIGHT, Cart: CART_WEIGHT}
+
+# Оценки хранятся приведёнными к моменту последнего затухания: вклад
+# добавленного позже умножается на 2 ** (часы после затухания / период),
+# поэтому порядок рецептов между запусками затухания верный.
+
+
+def decay_factor(decayed_at, created, half_life):
+    hours = (decayed_at - created).total_seconds() / 3600
+    return 0.5 ** (hours / half_life)
+
+
+def get_decay_state(lock=False):
+    queryset = PopularityDecay.objects.all()
+    if lock:
+        queryset = queryset.select_for_update()
+    state, _ = queryset.get_or_create(
+        pk=1,
+        defaults={'decayed_at': timezone.now()}
+    )
+    return state
+
+
+def add_popularity(changes):
+    """Меняет оценки; changes: id рецепта -> [(вес, дата добавления)].
+
+    Для удаления вес отрицательный, а дата та же, что при добавлении.
+    """
+    recipe_ids = sorted(changes)
+    with transaction.atomic():
+        # Рецепты блокируются до чтения decayed_at: затухание либо уже
+        # закоммичено, либо дождётся этой транзакции и учтёт изменение.
+        list(Recipe.objects.select_for_update().filter(
+            pk__in=recipe_ids
+        ).values_list('pk', flat=True))
+        decayed_at = get_decay_state().decayed_at
+        for recipe_id in recipe_ids:
+            popularity = trending = 0
+            for weight, created in changes[recipe_id]:
+                popularity += weight * decay_factor(
+                    decayed_at, created, POPULARITY_HALF_LIFE_HOURS
+                )
+                trending += weight * decay_factor(
+                    decayed_at, created, TRENDING_HALF_LIFE_HOURS
+                )
+            Recipe.objects.filter(pk=recipe_id).update(
+                popularity=Greatest(F('popularity') + popularity, Value(0.0)),
+                trending=Greatest(F('trending') + trending, Value(0.0))
+            )
+
+
+def decay_popularity():
+    """Затухание оценок за время с прошлого запуска одним UPDATE."""
+    with transaction.atomic():
+        state = get_decay_state(lock=True)
+        now = timezone.now()
+        Recipe.objects.filter(popularity__gt=0).update(
+            popularity=F('popularity') * decay_factor(
+                now, state.decayed_at, POPULARITY_HALF_LIFE_HOURS
+            ),
+            trending=F('trending') * decay_factor(
+                now, state.decayed_at, TRENDING_HALF_LIFE_HOURS
+            )
+        )
+        state.decayed_at = now
+        state.save()
+
+
+def rebuild_popularity(batch_size=1000):
+    """Пересчёт оценок по избранному и покупкам с учётом их дат."""
+    with transaction.atomic():
+        state = get_decay_state(lock=True)
+        state.decayed_at = timezone.now()
+        scores = defaultdict(lambda: [0, 0])
+        for model, weight in POPULARITY_WEIGHTS.items():
+            rows = model.objects.order_by().values_list('recipe_id', 'created')
+            for recipe_id, created in rows.iterator():
+                score = scores[recipe_id]
+                score[0] += weight * decay_factor(
+                    state.decayed_at, created, POPULARITY_HALF_LIFE_HOURS
+                )
+                score[1] += weight * decay_factor(
+                    state.decayed_at, created, TRENDING_HALF_LIFE_HOURS
+                )
+        Recipe.objects.update(popularity=0, trending=0)
+        Recipe.objects.bulk_update([
+            Recipe(pk=recipe_id, popularity=popularity, trending=trending)
+            for recipe_id, (popularity, trending) in scores.items()
+        ], ('popularity', 'trending'), batch_size=batch_size)
+        state.save()
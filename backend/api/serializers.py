@@ -5,13 +5,66 @@ from rest_framework import serializers
 from rest_framework.serializers import (CurrentUserDefault,
                                         UniqueTogetherValidator)
 
+from events.models import OutboxEvent  # isort:skip
+from events.signals import write_events  # isort:skip
 from recipes.models import (Cart, Favorite, Ingredient,  # isort:skip
                             IngredientAmount, Recipe, Tag)
+from recipes.signals import (recipe_changes,  # isort:skip
+                             recipe_ingredients_changed)
 from users.models import Follow  # isort:skip
+from .batch import BATCH_MAX_REQUESTS  # isort:skip
+from .delta import get_oldest_since  # isort:skip
+from .filters import get_tag_slug_map  # isort:skip
+from .subscriptions import get_following_ids  # isort:skip
 
 
 User = get_user_model()
 
+FLAG_FIELDS = ('is_favorited', 'is_in_shopping_cart', 'is_subscribed')
+
+
+def flags_disabled(request):
+    return request.query_params.get('flags') == '0'
+
+
+def get_sparse_fields(request, fields):
+    if request is None:
+        return fields
+    only = request.query_params.get('fields')
+    omit = request.query_params.get('omit')
+    if flags_disabled(request):
+        fields = tuple(field for field in fields if field not in FLAG_FIELDS)
+    if only:
+        only = set(only.split(','))
+        fields = tuple(field for field in fields if field in only)
+    if omit:
+        omit = set(omit.split(','))
+        fields = tuple(field for field in fields if field not in omit)
+    return fields
+
+
+class SparseFieldsMixin:
+    """Оставляет только поля из параметров запроса fields= и omit=.
+
+    flags=0 убирает флаги избранного, корзины и подписки, в том числе
+    у вложенных сериализаторов: клиент берёт их из /users/me/state/.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None or not hasattr(request, 'query_params'):
+            return
+        allowed = get_sparse_fields(request, tuple(self.fields))
+        for field_name in tuple(self.fields):
+            if field_name not in allowed:
+                self.fields.pop(field_name)
+        if flags_disabled(request):
+            for field in self.fields.values():
+                if isinstance(field, serializers.Serializer):
+                    for flag in FLAG_FIELDS:
+                        field.fields.pop(flag, None)
+
 
 class UserCreateSerializers(UserCreateSerializer):
 
@@ -32,7 +85,7 @@ class UserCreateSerializers(UserCreateSerializer):
         return user
 
 
-class UserSerializers(UserSerializer):
+class UserSerializers(SparseFieldsMixin, UserSerializer):
 
     is_subscribed = serializers.SerializerMethodField()
 
@@ -48,10 +101,7 @@ class UserSerializers(UserSerializer):
         )
 
     def get_is_subscribed(self, instans):
-        user = self.context['request'].user
-        if user.is_anonymous:
-            return False
-        return Follow.objects.filter(following=instans, user=user).exists()
+        return instans.id in get_following_ids(self.context['request'])
 
 
 class IngredientsSerializer(serializers.ModelSerializer):
@@ -73,8 +123,21 @@ class IngredientAmountSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit', 'amount')
 
 
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """Проверяет только тип pk, объекты загружает сериализатор рецепта."""
+
+    def to_internal_value(self, data):
+        # int(True) == 1, а PrimaryKeyRelatedField bool не принимает.
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            return int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+
 class IngredientRecipeCreateSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(
+    id = BulkPrimaryKeyRelatedField(
         queryset=Ingredient.objects.all()
     )
     amount = serializers.IntegerField()
@@ -91,7 +154,7 @@ class TagSerializers(serializers.ModelSerializer):
         fields = ('id', 'name', 'color', 'slug')
 
 
-class RecipeSerializers(serializers.ModelSerializer):
+class RecipeSerializers(SparseFieldsMixin, serializers.ModelSerializer):
     author = UserSerializers(read_only=True)
     ingredients = IngredientAmountSerializer(
         source='ingredientamount',
@@ -135,11 +198,70 @@ class RecipeSerializers(serializers.ModelSerializer):
         ).exists()
 
 
+class PantryRecipeSerializers(RecipeSerializers):
+    coverage = serializers.SerializerMethodField()
+    missing = serializers.SerializerMethodField()
+
+    class Meta(RecipeSerializers.Meta):
+        fields = RecipeSerializers.Meta.fields + ('coverage', 'missing')
+
+    def get_coverage(self, instans):
+        return round(self.context['pantry'][instans.id][0], 3)
+
+    def get_missing(self, instans):
+        return self.context['pantry'][instans.id][1]
+
+
+class PantrySearchSerializer(serializers.Serializer):
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False
+    )
+    tags = serializers.ListField(
+        child=serializers.SlugField(),
+        allow_empty=False,
+        required=False
+    )
+    max_cooking_time = serializers.IntegerField(min_value=1, required=False)
+
+    def validate_tags(self, value):
+        """Слаги превращаются в id тегов, неизвестный слаг - ошибка."""
+        slugs = get_tag_slug_map()
+        unknown = [slug for slug in value if slug not in slugs]
+        if unknown:
+            raise serializers.ValidationError(
+                f'Неизвестные теги: {", ".join(unknown)}'
+            )
+        return {slugs[slug] for slug in value}
+
+
+class BatchSerializer(serializers.Serializer):
+    requests = serializers.ListField(
+        child=serializers.CharField(max_length=2000),
+        allow_empty=False,
+        max_length=BATCH_MAX_REQUESTS
+    )
+
+
+class ChangesSerializer(serializers.Serializer):
+    updated_since = serializers.DateTimeField(required=False)
+    after = serializers.IntegerField(min_value=0, default=0)
+    limit = serializers.IntegerField(min_value=1, max_value=500, default=100)
+
+    def validate_updated_since(self, value):
+        if value < get_oldest_since():
+            raise serializers.ValidationError(
+                'Изменения за этот период не хранятся, '
+                'загрузите список целиком'
+            )
+        return value
+
+
 class RecipeCreateSerializers(serializers.ModelSerializer):
 
     author = UserSerializers(read_only=True)
     ingredients = IngredientRecipeCreateSerializer(many=True)
-    tags = serializers.PrimaryKeyRelatedField(
+    tags = BulkPrimaryKeyRelatedField(
         queryset=Tag.objects.all(),
         many=True
     )
@@ -158,20 +280,44 @@ class RecipeCreateSerializers(serializers.ModelSerializer):
             'cooking_time'
         )
 
+    def does_not_exist(self, pk):
+        return BulkPrimaryKeyRelatedField.default_error_messages[
+            'does_not_exist'
+        ].format(pk_value=pk)
+
+    def validate_tags(self, tags):
+        existing = Tag.objects.in_bulk(tags)
+        for tag_id in tags:
+            if tag_id not in existing:
+                raise serializers.ValidationError(self.does_not_exist(tag_id))
+        return tags
+
+    def validate_ingredients(self, ingredients):
+        existing = set(Ingredient.objects.filter(
+            id__in={ingredient['id'] for ingredient in ingredients}
+        ).values_list('id', flat=True))
+        errors = [
+            {} if ingredient['id'] in existing
+            else {'id': [self.does_not_exist(ingredient['id'])]}
+            for ingredient in ingredients
+        ]
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return ingredients
+
     def validate(self, data):
         ingredients = data['ingredients']
         if not ingredients:
             raise serializers.ValidationError(
                 {'ingredients': 'Необходимо ввести ингредиенты'}
             )
-        ingredients_list = []
+        seen = set()
         for ingredient_value in ingredients:
-            ingredient_id = ingredient_value['id']
-            if ingredient_id in ingredients_list:
+            if ingredient_value['id'] in seen:
                 raise serializers.ValidationError(
                     {'ingredients': 'Ингридиенты должны быть уникальными'}
                 )
-            ingredients_list.append(ingredient_id)
+            seen.add(ingredient_value['id'])
             if int(ingredient_value['amount']) <= 0:
                 raise serializers.ValidationError(
                     {'ingredients': 'Значение количества должно быть больше 0'}
@@ -186,28 +332,37 @@ class RecipeCreateSerializers(serializers.ModelSerializer):
         return data
 
     def ingredients_create(self, ingredients_data, recipe):
-        IngredientAmount.objects.bulk_create([IngredientAmount(
+        amounts = IngredientAmount.objects.bulk_create([IngredientAmount(
             recipe=recipe,
-            ingredient=ingredient['id'],
+            ingredient_id=ingredient['id'],
             amount=ingredient['amount']
         ) for ingredient in ingredients_data])
+        if amounts and amounts[0].pk is None:
+            # Без RETURNING id не заполнены; старые строки уже удалены.
+            amounts = IngredientAmount.objects.filter(recipe=recipe)
+        write_events(amounts, OutboxEvent.CREATED)
+        recipe_ingredients_changed.send(sender=Recipe, recipe=recipe)
 
     def create(self, validated_data):
         image = validated_data.pop('image')
         ingredients_data = validated_data.pop('ingredients')
         tags_data = validated_data.pop('tags')
-        recipe = Recipe.objects.create(image=image, **validated_data)
-        recipe.tags.set(tags_data)
-        self.ingredients_create(ingredients_data, recipe)
+        with recipe_changes():
+            recipe = Recipe.objects.create(image=image, **validated_data)
+            recipe.tags.set(tags_data)
+            self.ingredients_create(ingredients_data, recipe)
         return recipe
 
     def update(self, instance, validated_data):
-        instance.tags.clear()
-        tags_data = validated_data.pop('tags')
-        instance.tags.set(tags_data)
-        IngredientAmount.objects.filter(recipe=instance).delete()
-        self.ingredients_create(validated_data.pop('ingredients'), instance)
-        return super().update(instance, validated_data)
+        # Версия рецепта и событие outbox — одни на всё обновление.
+        with recipe_changes():
+            instance.tags.clear()
+            tags_data = validated_data.pop('tags')
+            instance.tags.set(tags_data)
+            IngredientAmount.objects.filter(recipe=instance).delete()
+            self.ingredients_create(validated_data.pop('ingredients'),
+                                    instance)
+            return super().update(instance, validated_data)
 
     def to_representation(self, instance):
         data = RecipeSerializers(
@@ -249,11 +404,9 @@ class FollowSerializers(serializers.ModelSerializer):
         )
 
     def get_is_subscribed(self, instans):
-        user = self.context['request'].user
-        return Follow.objects.filter(
-            following=instans.following,
-            user=user
-        ).exists()
+        return instans.following_id in get_following_ids(
+            self.context['request']
+        )
 
     def get_recipes(self, instans):
         request = self.context.get('request')
@@ -0,0 +1,174 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from events.signals import mark_delta_write  # isort:skip
+from recipes.models import (Cart, Favorite, Ingredient,  # isort:skip
+                            IngredientAmount, Recipe, Tag)
+from recipes.signals import (defer_recipe_change,  # isort:skip
+                             recipe_ingredients_changed, recipes_changed)
+from users.models import Follow  # isort:skip
+from .authentication import (token_cache_key,  # isort:skip
+                             user_token_cache_keys)
+from .etags import bump_user_state_version  # isort:skip
+from .feed_cache import invalidate_feed_cache  # isort:skip
+from .filters import invalidate_tag_slug_map  # isort:skip
+from .pantry import invalidate_pantry_index  # isort:skip
+from .popularity import POPULARITY_WEIGHTS, add_popularity  # isort:skip
+from .subscriptions import invalidate_following_ids  # isort:skip
+
+User = get_user_model()
+
+
+def bump_recipe_versions(recipes):
+    mark_delta_write()
+    recipes.update(version=F('version') + 1, updated=timezone.now())
+
+
+# Кэши сбрасываются после коммита, иначе другой воркер может успеть
+# заново заполнить их данными из незакоммиченной транзакции.
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=IngredientAmount)
+@receiver(post_delete, sender=IngredientAmount)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(recipe_ingredients_changed)
+def pantry_changed(sender, **kwargs):
+    transaction.on_commit(invalidate_pantry_index)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=IngredientAmount)
+@receiver(post_delete, sender=IngredientAmount)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(recipe_ingredients_changed)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def feed_changed(sender, **kwargs):
+    transaction.on_commit(invalidate_feed_cache)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def tag_changed(sender, **kwargs):
+    transaction.on_commit(invalidate_tag_slug_map)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, created, **kwargs):
+    if not created and not defer_recipe_change(instance.pk):
+        bump_recipe_versions(Recipe.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=IngredientAmount)
+@receiver(post_delete, sender=IngredientAmount)
+def ingredient_amount_changed(sender, instance, **kwargs):
+    if not defer_recipe_change(instance.recipe_id):
+        bump_recipe_versions(Recipe.objects.filter(pk=instance.recipe_id))
+
+
+@receiver(recipe_ingredients_changed)
+def recipe_ingredients_replaced(sender, recipe, **kwargs):
+    if not defer_recipe_change(recipe.pk):
+        bump_recipe_versions(Recipe.objects.filter(pk=recipe.pk))
+
+
+@receiver(recipes_changed)
+def recipes_changed_together(sender, recipe_ids, **kwargs):
+    bump_recipe_versions(Recipe.objects.filter(pk__in=recipe_ids))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(sender, instance, action, reverse, pk_set,
+                        **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        if defer_recipe_change(instance.pk):
+            return
+        recipes = Recipe.objects.filter(pk=instance.pk)
+    elif pk_set:
+        recipes = Recipe.objects.filter(pk__in=pk_set)
+    else:
+        recipes = Recipe.objects.filter(tags=instance)
+    bump_recipe_versions(recipes)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def tag_version_changed(sender, instance, **kwargs):
+    bump_recipe_versions(Recipe.objects.filter(tags=instance))
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(pre_delete, sender=Ingredient)
+def ingredient_changed(sender, instance, **kwargs):
+    bump_recipe_versions(Recipe.objects.filter(ingredients=instance))
+
+
+@receiver(post_save, sender=User)
+def author_changed(sender, instance, created, update_fields, **kwargs):
+    if created or update_fields == frozenset(('last_login',)):
+        return
+    bump_recipe_versions(Recipe.objects.filter(author=instance))
+    transaction.on_commit(invalidate_feed_cache)
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+@receiver(post_save, sender=Cart)
+@receiver(post_delete, sender=Cart)
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def user_state_changed(sender, instance, **kwargs):
+    user_id = instance.user_id
+    transaction.on_commit(lambda: bump_user_state_version(user_id))
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def follow_changed(sender, instance, **kwargs):
+    user_id = instance.user_id
+    # Сразу — чтобы ответ этого же запроса видел новую подписку, и ещё
+    # раз после коммита — если другой воркер успел заполнить кэш старым.
+    invalidate_following_ids(user_id)
+    transaction.on_commit(lambda: invalidate_following_ids(user_id))
+
+
+@receiver(post_save, sender=User)
+@receiver(pre_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    keys = user_token_cache_keys(instance.pk)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    key = token_cache_key(instance.key)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=Cart)
+def popularity_added(sender, instance, created, **kwargs):
+    if created:
+        add_popularity({instance.recipe_id: [
+            (POPULARITY_WEIGHTS[sender], instance.created)
+        ]})
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=Cart)
+def popularity_removed(sender, instance, **kwargs):
+    add_popularity({instance.recipe_id: [
+        (-POPULARITY_WEIGHTS[sender], instance.created)
+    ]})
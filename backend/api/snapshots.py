@@ -0,0 +1,177 @@
+"""Публичные ответы API в виде статических файлов для nginx.
+
+Файл ответа на /api/<путь>/ лежит в <корень>/current/api/<путь>/index.json.
+current — симлинк на каталог версии: полная пересборка пишет новую
+версию и переключает симлинк, а обычная синхронизация переписывает
+только файлы, затронутые событиями outbox с прошлого раза. Позиция
+курсора хранится в манифесте версии. События о тегах и ингредиентах
+обновляют их списки, события о рецепте и его ингредиентах — рецепт;
+изменение тега, ингредиента или автора пишет события о его рецептах.
+"""
+import json
+import os
+import shutil
+import time
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.test import RequestFactory
+
+from events.outbox import OutboxCursor  # isort:skip
+from recipes.models import (Ingredient,  # isort:skip
+                            IngredientAmount, Recipe, Tag)
+from .views import IngredientViewSet, RecipeViewSet, TagViewSet  # isort:skip
+
+CURRENT = 'current'
+MANIFEST = 'manifest.json'
+KEEP_VERSIONS = 2
+
+
+def write_atomic(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = f'{path}.{os.getpid()}.tmp'
+    with open(temporary, 'wb') as file:
+        file.write(content)
+    os.replace(temporary, path)
+
+
+class SnapshotPublisher:
+
+    def __init__(self, root=None, base_url=None):
+        self.root = root or settings.API_SNAPSHOT_ROOT
+        base_url = base_url or settings.API_SNAPSHOT_BASE_URL
+        if not base_url:
+            # Иначе ссылки на картинки в файлах вели бы не на сайт.
+            raise ImproperlyConfigured('Не задан API_SNAPSHOT_BASE_URL')
+        url = urlsplit(base_url)
+        self.factory = RequestFactory(
+            HTTP_HOST=url.netloc,
+            HTTP_ACCEPT='application/json',
+            **{'wsgi.url_scheme': url.scheme}
+        )
+        # Лимиты запросов рассчитаны на клиентов, а не на публикатор.
+        self.tags = TagViewSet.as_view(
+            {'get': 'list'}, throttle_classes=()
+        )
+        self.ingredients = IngredientViewSet.as_view(
+            {'get': 'list'}, throttle_classes=()
+        )
+        self.recipe = RecipeViewSet.as_view(
+            {'get': 'retrieve'}, throttle_classes=()
+        )
+
+    def render(self, view, path, **kwargs):
+        response = view(self.factory.get(path), **kwargs)
+        if response.status_code != 200:
+            return None
+        if hasattr(response, 'render'):
+            response.render()
+        return response.content
+
+    def file_path(self, version_dir, path):
+        return os.path.join(version_dir, path.strip('/'), 'index.json')
+
+    def publish(self, rebuild=False):
+        current = os.path.join(self.root, CURRENT)
+        manifest = {}
+        if not rebuild and os.path.isdir(current):
+            version_dir = os.path.realpath(current)
+            with open(os.path.join(version_dir, MANIFEST)) as file:
+                manifest = json.load(file)
+        # Манифест без курсора остался от сверки по версиям рецептов.
+        rebuild = 'last_event_id' not in manifest
+        if rebuild:
+            version_dir = os.path.join(self.root, 'v%d' % time.time_ns())
+            # Позиция берётся до чтения таблиц: события после неё
+            # перерисуют файлы ещё раз, но ни одно не потеряется.
+            cursor = OutboxCursor.latest()
+            written = self.render_all(version_dir)
+        else:
+            cursor = OutboxCursor(manifest['last_event_id'], {
+                int(event_id): noticed
+                for event_id, noticed in manifest['gaps'].items()
+            })
+            written = self.sync(version_dir, cursor)
+        write_atomic(os.path.join(version_dir, MANIFEST), json.dumps({
+            'last_event_id': cursor.last_event_id,
+            'gaps': cursor.gaps,
+        }).encode())
+        if rebuild:
+            self.switch(version_dir)
+        return written
+
+    def render_all(self, version_dir):
+        self.render_tags(version_dir)
+        self.render_ingredients(version_dir)
+        written = 2
+        pks = Recipe.objects.order_by().values_list('id', flat=True)
+        for pk in pks.iterator():
+            written += self.render_recipe(version_dir, pk)
+        return written
+
+    def sync(self, version_dir, cursor):
+        """Перерисовывает то, о чём есть события после курсора."""
+        # Читаются события всех моделей: иначе курсор счёл бы id чужих
+        # событий пропусками.
+        event_ids = []
+        models = set()
+        recipe_ids = set()
+        for event in cursor.events().iterator():
+            event_ids.append(event.id)
+            models.add(event.model)
+            if event.model == Recipe._meta.label:
+                recipe_ids.add(event.object_id)
+            elif event.model == IngredientAmount._meta.label:
+                recipe_ids.add(json.loads(event.payload)['recipe_id'])
+        written = 0
+        if Tag._meta.label in models:
+            written += self.render_tags(version_dir)
+        if Ingredient._meta.label in models:
+            written += self.render_ingredients(version_dir)
+        for pk in recipe_ids:
+            written += self.render_recipe(version_dir, pk)
+        cursor.advance(event_ids)
+        return written
+
+    def render_tags(self, version_dir):
+        path = '/api/tags/'
+        self.write(self.file_path(version_dir, path),
+                   self.render(self.tags, path))
+        return 1
+
+    def render_ingredients(self, version_dir):
+        path = '/api/ingredients/'
+        self.write(self.file_path(version_dir, path),
+                   self.render(self.ingredients, path))
+        return 1
+
+    def render_recipe(self, version_dir, pk):
+        """Удалённый рецепт отвечает 404, и его файл удаляется."""
+        path = f'/api/recipes/{pk}/'
+        self.write(self.file_path(version_dir, path),
+                   self.render(self.recipe, path, pk=str(pk)))
+        return 1
+
+    def write(self, path, content):
+        if content is not None:
+            write_atomic(path, content)
+        elif os.path.exists(path):
+            os.remove(path)
+            os.rmdir(os.path.dirname(path))
+
+    def switch(self, version_dir):
+        """Переключает current на новую версию и удаляет самые старые.
+
+        Симлинк относительный, чтобы работать и в контейнере nginx,
+        где том со статикой смонтирован по другому пути.
+        """
+        link = os.path.join(self.root, f'{CURRENT}.{os.getpid()}.tmp')
+        os.symlink(os.path.basename(version_dir), link)
+        os.replace(link, os.path.join(self.root, CURRENT))
+        versions = sorted((
+            name for name in os.listdir(self.root)
+            if name.startswith('v') and name[1:].isdigit()
+        ), key=lambda name: int(name[1:]))
+        for name in versions[:-KEEP_VERSIONS]:
+            shutil.rmtree(os.path.join(self.root, name))
@@ -0,0 +1,30 @@
+from django.core.cache import cache
+
+from users.models import Follow  # isort:skip
+from .metrics import record_cache  # isort:skip
+from .utils import (get_request_memo,  # isort:skip
+                    invalidated_cache_timeout)
+
+FOLLOWING_KEY = 'following_ids_%s'
+
+
+def get_following_ids(request):
+    user = request.user
+    if user.is_anonymous:
+        return frozenset()
+    memo = get_request_memo(request)
+    if 'following_ids' not in memo:
+        key = FOLLOWING_KEY % user.pk
+        following_ids = cache.get(key)
+        record_cache('following_ids', following_ids is not None)
+        if following_ids is None:
+            following_ids = frozenset(Follow.objects.filter(
+                user=user
+            ).values_list('following_id', flat=True))
+            cache.set(key, following_ids, invalidated_cache_timeout())
+        memo['following_ids'] = following_ids
+    return memo['following_ids']
+
+
+def invalidate_following_ids(user_id):
+    cache.delete(FOLLOWING_KEY % user_id)
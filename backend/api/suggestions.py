@@ -0,0 +1,208 @@
+import heapq
+import json
+import threading
+import time
+from collections import Counter
+from itertools import islice
+
+from django.db import connection
+
+from events.models import OutboxEvent  # isort:skip
+from events.outbox import OutboxCursor  # isort:skip
+from recipes.models import Favorite, Recipe  # isort:skip
+from users.models import Follow  # isort:skip
+
+REFRESH_INTERVAL = 5
+REBUILD_INTERVAL = 60 * 60
+FRIEND_OF_FRIEND_WEIGHT = 1.0
+FAVORITE_AUTHOR_WEIGHT = 1.0
+CO_FAVORITE_WEIGHT = 0.5
+FANS_LIMIT = 100
+SIMILAR_USERS_LIMIT = 50
+FAVORITES_LIMIT = 200
+
+MODELS = {
+    model._meta.label: model for model in (Follow, Favorite, Recipe)
+}
+
+
+class SocialGraph:
+    """Разреженные списки смежности подписок и избранного в памяти.
+
+    Строится целиком из таблиц, а потом догоняет изменения по событиям
+    outbox. Все структуры — множества и словари, поэтому повторное
+    применение события, уже попавшего в выборку из таблиц, ничего не
+    портит. Построенный граф меняется только под lock.
+    """
+
+    def __init__(self):
+        self.following = {}
+        self.followers = {}
+        self.favorites = {}
+        self.fans = {}
+        self.authors = {}
+        self.popular = []
+        self.cursor = None
+        self.built = 0
+        self.refreshed = 0
+
+    def build(self):
+        # Позиция в outbox берётся до чтения таблиц: события после неё
+        # применятся повторно, но ни одно не потеряется.
+        self.cursor = OutboxCursor.latest()
+        follows = Follow.objects.order_by().values_list(
+            'user_id', 'following_id'
+        )
+        for user_id, author_id in follows.iterator():
+            self.follow(user_id, author_id)
+        favorites = Favorite.objects.order_by().values_list(
+            'user_id', 'recipe_id'
+        )
+        for user_id, recipe_id in favorites.iterator():
+            self.favorite(user_id, recipe_id)
+        self.authors = dict(
+            Recipe.objects.order_by().values_list('id', 'author_id')
+        )
+        self.built = self.refreshed = time.monotonic()
+        self.rank_popular()
+
+    def refresh(self):
+        # Читаются события всех моделей: иначе курсор счёл бы id чужих
+        # событий пропусками.
+        event_ids = []
+        for event in self.cursor.events().iterator():
+            if event.model in MODELS:
+                self.apply(event)
+            event_ids.append(event.id)
+        self.cursor.advance(event_ids)
+        if event_ids:
+            self.rank_popular()
+        self.refreshed = time.monotonic()
+
+    def apply(self, event):
+        payload = json.loads(event.payload)
+        model = MODELS[event.model]
+        created = event.action == OutboxEvent.CREATED
+        deleted = event.action == OutboxEvent.DELETED
+        if model is Follow and (created or deleted):
+            (self.follow if created else self.unfollow)(
+                payload['user_id'], payload['following_id']
+            )
+        elif model is Favorite and (created or deleted):
+            (self.favorite if created else self.unfavorite)(
+                payload['user_id'], payload['recipe_id']
+            )
+        elif model is Recipe and created:
+            self.authors[event.object_id] = payload['author_id']
+        elif model is Recipe and deleted:
+            self.authors.pop(event.object_id, None)
+
+    def follow(self, user_id, author_id):
+        self.following.setdefault(user_id, set()).add(author_id)
+        self.followers.setdefault(author_id, set()).add(user_id)
+
+    def unfollow(self, user_id, author_id):
+        self.following.get(user_id, set()).discard(author_id)
+        self.followers.get(author_id, set()).discard(user_id)
+
+    def favorite(self, user_id, recipe_id):
+        self.favorites.setdefault(user_id, set()).add(recipe_id)
+        self.fans.setdefault(recipe_id, set()).add(user_id)
+
+    def unfavorite(self, user_id, recipe_id):
+        self.favorites.get(user_id, set()).discard(recipe_id)
+        self.fans.get(recipe_id, set()).discard(user_id)
+
+    def rank_popular(self):
+        self.popular = heapq.nlargest(
+            FANS_LIMIT,
+            self.followers,
+            key=lambda author_id: len(self.followers[author_id])
+        )
+
+    def suggest(self, user_id, exclude, limit):
+        """Авторы по подпискам подписок и по похожему избранному.
+
+        Если сигналов мало, список добирается самыми популярными
+        авторами.
+        """
+        scores = Counter()
+        self.score_friends(user_id, scores)
+        self.score_favorites(user_id, scores)
+        exclude = {user_id, *exclude}
+        for author_id in exclude:
+            scores.pop(author_id, None)
+        result = [author_id for author_id, _ in heapq.nlargest(
+            limit, scores.items(), key=lambda item: (item[1], -item[0])
+        )]
+        popular = (author_id for author_id in self.popular
+                   if author_id not in exclude and author_id not in scores)
+        result.extend(islice(popular, limit - len(result)))
+        return result
+
+    def score_friends(self, user_id, scores):
+        for friend_id in self.following.get(user_id, ()):
+            for author_id in self.following.get(friend_id, ()):
+                scores[author_id] += FRIEND_OF_FRIEND_WEIGHT
+
+    def score_favorites(self, user_id, scores):
+        similar = Counter()
+        for recipe_id in self.favorites.get(user_id, ()):
+            self.score_recipe(recipe_id, scores, FAVORITE_AUTHOR_WEIGHT)
+            similar.update(islice(self.fans.get(recipe_id, ()), FANS_LIMIT))
+        similar.pop(user_id, None)
+        for other_id, overlap in similar.most_common(SIMILAR_USERS_LIMIT):
+            recipes = islice(self.favorites.get(other_id, ()),
+                             FAVORITES_LIMIT)
+            for recipe_id in recipes:
+                self.score_recipe(recipe_id, scores,
+                                  CO_FAVORITE_WEIGHT * overlap)
+
+    def score_recipe(self, recipe_id, scores, weight):
+        author_id = self.authors.get(recipe_id)
+        if author_id is not None:
+            scores[author_id] += weight
+
+
+_graph = None
+_lock = threading.Lock()
+_building = threading.Event()
+
+
+def build_graph():
+    """Строит новый граф в фоне и подменяет им текущий.
+
+    Запросы тем временем получают подсказки по старому графу.
+    """
+    global _graph
+    try:
+        graph = SocialGraph()
+        graph.build()
+        graph.refresh()
+        with _lock:
+            graph.refresh()
+            _graph = graph
+    finally:
+        connection.close()
+        _building.clear()
+
+
+def start_graph_build():
+    with _lock:
+        if _building.is_set():
+            return
+        _building.set()
+    threading.Thread(target=build_graph, daemon=True).start()
+
+
+def suggest_authors(user_id, exclude, limit):
+    """Пока первый граф строится, подсказок нет."""
+    graph = _graph
+    if graph is None or time.monotonic() - graph.built > REBUILD_INTERVAL:
+        start_graph_build()
+    if graph is None:
+        return []
+    with _lock:
+        if time.monotonic() - graph.refreshed > REFRESH_INTERVAL:
+            graph.refresh()
+        return graph.suggest(user_id, exclude, limit)
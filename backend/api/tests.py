@@ -0,0 +1,222 @@
+import os
+import tempfile
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed, ValidationError
+from rest_framework.test import (APIClient, APIRequestFactory,
+                                 force_authenticate)
+
+from recipes.models import (Cart, Favorite, Ingredient,  # isort:skip
+                            IngredientAmount, Recipe, Tag)
+from users.models import Follow  # isort:skip
+from .authentication import CachedTokenAuthentication  # isort:skip
+from .serializers import BulkPrimaryKeyRelatedField  # isort:skip
+from .snapshots import SnapshotPublisher  # isort:skip
+from .views import RecipeViewSet  # isort:skip
+
+User = get_user_model()
+
+
+class JsonFastPathTests(TestCase):
+    """Ответы, собранные базой, совпадают с сериализатором байт в байт."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='reader',
+                                       email='reader@example.com')
+        author = User.objects.create(username='author',
+                                     email='author@example.com',
+                                     first_name='Анна', last_name='Петрова')
+        tags = [
+            Tag.objects.create(name='Завтрак', color='#E26C2D',
+                               slug='breakfast'),
+            Tag.objects.create(name='Обед', color='#49B64E', slug='lunch'),
+        ]
+        ingredients = [
+            Ingredient.objects.create(name='соль', measurement_unit='г'),
+            Ingredient.objects.create(name='вода', measurement_unit='мл'),
+        ]
+        images = ('recipes/тест суп.png', 'recipes/a&b?#%.png',
+                  'recipes/plain.png')
+        for number, image in enumerate(images):
+            recipe = Recipe.objects.create(
+                author=author,
+                name=f'Суп "{number}"',
+                text='Строка\nс кавычками "" и \\',
+                cooking_time=number + 1,
+                image=image
+            )
+            recipe.tags.set(tags[:number + 1])
+            for amount, ingredient in enumerate(ingredients, start=1):
+                IngredientAmount.objects.create(
+                    recipe=recipe, ingredient=ingredient, amount=amount
+                )
+        recipe = Recipe.objects.first()
+        Favorite.objects.create(user=cls.user, recipe=recipe)
+        Cart.objects.create(user=cls.user, recipe=recipe)
+        Follow.objects.create(user=cls.user, following=author)
+
+    def get(self, user, path, action, fast, **kwargs):
+        view = RecipeViewSet.as_view({'get': action}, throttle_classes=())
+        request = APIRequestFactory().get(path,
+                                          HTTP_ACCEPT='application/json')
+        if user.is_authenticated:
+            force_authenticate(request, user=user)
+        # Кэш ленты отдал бы второму запросу байты первого.
+        with override_settings(RECIPE_JSON_FAST_PATH=fast,
+                               FEED_CACHE_MAX_PAGE=0):
+            response = view(request, **kwargs)
+            if hasattr(response, 'render'):
+                response.render()
+        self.assertEqual(response.status_code, 200)
+        return response.content
+
+    def assert_same(self, path, action, **kwargs):
+        for user in (AnonymousUser(), self.user):
+            with self.subTest(user=str(user), path=path):
+                self.assertEqual(
+                    self.get(user, path, action, True, **kwargs),
+                    self.get(user, path, action, False, **kwargs)
+                )
+
+    def test_list(self):
+        self.assert_same('/api/recipes/', 'list')
+
+    def test_detail(self):
+        for recipe in Recipe.objects.all():
+            self.assert_same(f'/api/recipes/{recipe.pk}/', 'retrieve',
+                             pk=str(recipe.pk))
+
+    def test_image_url_is_quoted(self):
+        recipe = Recipe.objects.get(image='recipes/тест суп.png')
+        content = self.get(AnonymousUser(), f'/api/recipes/{recipe.pk}/',
+                           'retrieve', True, pk=str(recipe.pk))
+        self.assertIn(
+            b'recipes/%D1%82%D0%B5%D1%81%D1%82%20%D1%81%D1%83%D0%BF.png',
+            content
+        )
+
+
+class RecipeDetailTests(TestCase):
+
+    def test_non_numeric_pk_is_not_found(self):
+        self.assertEqual(self.client.get('/api/recipes/abc/').status_code,
+                         404)
+
+
+class BulkPrimaryKeyRelatedFieldTests(TestCase):
+
+    def test_bool_is_rejected(self):
+        field = BulkPrimaryKeyRelatedField(queryset=Ingredient.objects.all())
+        self.assertEqual(field.to_internal_value('3'), 3)
+        with self.assertRaises(ValidationError):
+            field.to_internal_value(True)
+
+
+class SubscribeTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='reader',
+                                        email='reader@example.com')
+        self.author = User.objects.create(username='author',
+                                          email='author@example.com')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_new_follow_is_subscribed(self):
+        # Первый запрос кладёт в кэш пустой список подписок.
+        self.client.get('/api/users/me/state/')
+        response = self.client.post(
+            f'/api/users/{self.author.pk}/subscribe/'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertIs(response.json()['is_subscribed'], True)
+
+
+class BatchTests(TestCase):
+
+    def test_failing_subrequest_does_not_fail_batch(self):
+        with mock.patch.object(RecipeViewSet, 'retrieve',
+                               side_effect=RuntimeError):
+            response = APIClient().post(
+                '/api/batch/',
+                {'requests': ['/api/recipes/1/', '/api/tags/']},
+                format='json'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['status'] for item in response.json()],
+                         [500, 200])
+
+
+class TokenAuthenticationTests(TransactionTestCase):
+    """Сброс записи идёт в on_commit, поэтому нужны настоящие коммиты."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='reader',
+                                        email='reader@example.com')
+        self.key = Token.objects.create(user=self.user).key
+        self.auth = CachedTokenAuthentication()
+
+    def test_cache_hit_does_not_query(self):
+        self.auth.authenticate_credentials(self.key)
+        with self.assertNumQueries(0):
+            user, token = self.auth.authenticate_credentials(self.key)
+        self.assertEqual(user, self.user)
+        self.assertEqual(token.key, self.key)
+
+    def test_deactivation_drops_cached_user(self):
+        self.auth.authenticate_credentials(self.key)
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.authenticate_credentials(self.key)
+
+
+class SnapshotTests(TestCase):
+
+    def setUp(self):
+        self.tag = Tag.objects.create(name='Обед', color='#49B64E',
+                                      slug='lunch')
+        author = User.objects.create(username='author',
+                                     email='author@example.com')
+        self.recipe = Recipe.objects.create(author=author, name='Суп',
+                                            text='Суп', cooking_time=5,
+                                            image='recipes/plain.png')
+        self.recipe.tags.set([self.tag])
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        self.publisher = SnapshotPublisher(root=root.name,
+                                           base_url='http://example.com')
+        self.api = os.path.join(root.name, 'current', 'api')
+        self.publisher.publish()
+
+    def read(self, path):
+        with open(os.path.join(self.api, path, 'index.json')) as file:
+            return file.read()
+
+    def test_nothing_changed(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.publisher.publish(), 0)
+
+    def test_tag_rename_renders_tags_and_its_recipes(self):
+        self.tag.name = 'Ужин'
+        self.tag.save()
+        # Список тегов и рецепт, список ингредиентов не трогается.
+        self.assertEqual(self.publisher.publish(), 2)
+        self.assertIn('Ужин', self.read('tags'))
+        self.assertIn('Ужин', self.read(f'recipes/{self.recipe.pk}'))
+
+    def test_deleted_recipe_is_removed(self):
+        self.recipe.delete()
+        self.publisher.publish()
+        self.assertFalse(
+            os.path.exists(os.path.join(self.api, 'recipes',
+                                        str(self.recipe.pk)))
+        )
@@ -0,0 +1,77 @@
+from rest_framework.throttling import SimpleRateThrottle
+
+UPLOAD_COST_BYTES = 256 * 1024
+
+
+class CostThrottle(SimpleRateThrottle):
+    """Лимит запросов с весами в общем кэше.
+
+    Бюджет из rate ('120/min') расходуется в окнах фиксированной длины.
+    Стоимость запроса берётся из атрибута throttle_costs вьюсета по имени
+    action плюс надбавка за размер тела запроса. Счётчик окна меняется
+    только атомарными cache.incr/decr, поэтому параллельные запросы не
+    могут потратить больше бюджета. Кэш должен быть общим для всех
+    воркеров, это проверяет api.checks.
+    """
+    cache_format = 'throttle_%(scope)s_%(ident)s'
+
+    def get_cost(self, request, view):
+        costs = getattr(view, 'throttle_costs', {})
+        cost = costs.get(getattr(view, 'action', None), 1)
+        content_length = request.META.get('CONTENT_LENGTH') or 0
+        try:
+            cost += int(content_length) // UPLOAD_COST_BYTES
+        except ValueError:
+            pass
+        return min(cost, self.num_requests)
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        self.now = self.timer()
+        window = int(self.now // self.duration)
+        key = f'{self.key}_{window}'
+        cost = self.get_cost(request, view)
+        self.cache.add(key, 0, self.duration)
+        try:
+            spent = self.cache.incr(key, cost)
+        except ValueError:
+            # Счётчик успел истечь между add и incr.
+            self.cache.add(key, 0, self.duration)
+            spent = self.cache.incr(key, cost)
+        if spent > self.num_requests:
+            # Отклонённый запрос бюджет не тратит.
+            self.cache.decr(key, cost)
+            self.wait_time = (window + 1) * self.duration - self.now
+            return False
+        return True
+
+    def wait(self):
+        return self.wait_time
+
+
+class UserCostThrottle(CostThrottle):
+    scope = 'user'
+
+    def get_cache_key(self, request, view):
+        if not request.user.is_authenticated:
+            return None
+        return self.cache_format % {
+            'scope': self.scope,
+            'ident': request.user.pk
+        }
+
+
+class AnonCostThrottle(CostThrottle):
+    scope = 'anon'
+
+    def get_cache_key(self, request, view):
+        if request.user.is_authenticated:
+            return None
+        return self.cache_format % {
+            'scope': self.scope,
+            'ident': self.get_ident(request)
+        }
@@ -1,7 +1,8 @@
 from django.urls import include, path
 from rest_framework.routers import SimpleRouter
 
-from .views import IngredientViewSet, RecipeViewSet, TagViewSet, UserViewSet
+from .views import (BatchView, IngredientViewSet, RecipeViewSet, TagViewSet,
+                    UserViewSet)
 
 router = SimpleRouter()
 router.register(r'recipes', RecipeViewSet, basename='recipe')
@@ -10,6 +11,7 @@ router.register(r'tags', TagViewSet, basename='tag')
 router.register(r'users', UserViewSet, basename='user')
 
 urlpatterns = [
+    path('batch/', BatchView.as_view(), name='batch'),
     path('', include(router.urls)),
     path('', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken')),
@@ -0,0 +1,27 @@
+from django.conf import settings
+
+PROCESS_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+PROCESS_CACHE_TIMEOUT = 10
+
+
+def get_request_memo(request):
+    """Словарь для данных, которые вычисляются один раз за запрос."""
+    request = getattr(request, '_request', request)
+    if not hasattr(request, 'memo'):
+        request.memo = {}
+    return request.memo
+
+
+def invalidated_cache_timeout():
+    """Срок записей, которые сбрасываются по изменению данных.
+
+    Сброс в общем кэше видят все воркеры, и срок не нужен. В кэше на
+    процесс его видит только свой воркер, поэтому там записи живут
+    PROCESS_CACHE_TIMEOUT секунд.
+    """
+    if settings.CACHES['default']['BACKEND'] in PROCESS_CACHES:
+        return PROCESS_CACHE_TIMEOUT
+    return None
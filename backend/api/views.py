@@ -1,24 +1,47 @@
+from collections import OrderedDict
+
 from django.contrib.auth import get_user_model
+from django.core.paginator import InvalidPage
 from django.db.models import Sum
-from django.http import HttpResponse
+from django.http import Http404, HttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import SAFE_METHODS, AllowAny, IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
 from recipes.models import (Ingredient, IngredientAmount, Recipe,  # isort:skip
                             Tag)
-from .serializers import (CartCreateSerializers,  # isort:skip
-                          FavoriteCreateSerializers, FollowCreateSerializers,
-                          FollowSerializers, IngredientsSerializer,
+from .serializers import (BatchSerializer,  # isort:skip
+                          CartCreateSerializers, ChangesSerializer,
+                          FavoriteCreateSerializers,
+                          FollowCreateSerializers, FollowSerializers,
+                          IngredientsSerializer,
+                          PantryRecipeSerializers, PantrySearchSerializer,
                           RecipeCreateSerializers, LiteRecipeSerializers,
-                          RecipeSerializers, TagSerializers, UserSerializers)
-from .filters import RecipeFilters, IngredientSearchFilter  # isort:skip
+                          RecipeSerializers, TagSerializers, UserSerializers,
+                          get_sparse_fields)
+from .filters import IngredientSearchFilter, RecipeFilters  # isort:skip
+from .batch import dispatch_batch  # isort:skip
+from .deletion import delete_recipes  # isort:skip
+from .delta import (changed_since, collection_changes,  # isort:skip
+                    deleted_ids, get_horizon, next_link)
+from .etags import (etag_matches, get_user_state_version,  # isort:skip
+                    make_etag)
+from .facets import get_facets  # isort:skip
+from .feed_cache import (feed_cache_key, feed_response,  # isort:skip
+                         get_cached_feed)
+from .json_fast_path import (recipe_json, recipes_json,  # isort:skip
+                             use_json_fast_path)
+from .metrics import EXPORT_SIZE  # isort:skip
 from .pagination import PageLimitPagination  # isort:skip
+from .pantry import get_pantry_index  # isort:skip
 from .permissions import AdminOrReadOnly, AuthorOrReadOnly  # isort:skip
+from .subscriptions import get_following_ids  # isort:skip
+from .suggestions import suggest_authors  # isort:skip
 from users.models import Follow  # isort:skip
 
 
@@ -26,10 +49,126 @@ User = get_user_model()
 
 
 class RecipeViewSet(viewsets.ModelViewSet):
-    queryset = Recipe.objects.all()
     pagination_class = PageLimitPagination
     filter_class = RecipeFilters
     permission_classes = (AuthorOrReadOnly,)
+    throttle_costs = {
+        'create': 5,
+        'update': 5,
+        'partial_update': 5,
+        'pantry': 3,
+        'facets': 2,
+        'changes': 2,
+        'download_shopping_cart': 10,
+    }
+
+    def get_queryset(self):
+        queryset = Recipe.objects.all()
+        if self.request.method not in SAFE_METHODS:
+            return queryset
+        return self.with_related(queryset)
+
+    def with_related(self, queryset):
+        fields = get_sparse_fields(
+            self.request,
+            RecipeSerializers.Meta.fields
+        )
+        if 'author' in fields:
+            queryset = queryset.select_related('author')
+        if 'tags' in fields:
+            queryset = queryset.prefetch_related('tags')
+        if 'ingredients' in fields:
+            queryset = queryset.prefetch_related(
+                'ingredientamount__ingredient'
+            )
+        if 'text' not in fields:
+            queryset = queryset.defer('text')
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        key = feed_cache_key(request)
+        if key is not None:
+            return feed_response(request, get_cached_feed(
+                key, lambda: self.render_list(request, *args, **kwargs)
+            ))
+        etag = self.get_list_etag(request)
+        if etag and etag_matches(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED,
+                            headers={'ETag': etag})
+        response = self.list_page(request, *args, **kwargs)
+        if etag:
+            response['ETag'] = etag
+        return response
+
+    def list_page(self, request, *args, **kwargs):
+        if not use_json_fast_path(request):
+            return super().list(request, *args, **kwargs)
+        ids = self.paginate_queryset(
+            self.filter_queryset(Recipe.objects.all()).values_list(
+                'id', flat=True
+            )
+        )
+        paginator = self.paginator
+        envelope = request.accepted_renderer.render(
+            OrderedDict((
+                ('count', paginator.page.paginator.count),
+                ('next', paginator.get_next_link()),
+                ('previous', paginator.get_previous_link()),
+            )),
+            request.accepted_media_type,
+            self.get_renderer_context()
+        )
+        return HttpResponse(
+            b'%s,"results":%s}' % (envelope[:-1], recipes_json(request, ids)),
+            content_type=request.accepted_media_type
+        )
+
+    def render_list(self, request, *args, **kwargs):
+        response = self.list_page(request, *args, **kwargs)
+        if isinstance(response, Response):
+            response.accepted_renderer = request.accepted_renderer
+            response.accepted_media_type = request.accepted_media_type
+            response.renderer_context = self.get_renderer_context()
+            response.render()
+        return (response.content, response['Content-Type'],
+                self.get_list_etag(request))
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            versions = list(Recipe.objects.filter(
+                pk=kwargs['pk']
+            ).values_list('id', 'version'))
+        except (TypeError, ValueError):
+            raise Http404
+        etag = make_etag(request, versions) if versions else None
+        if etag and etag_matches(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED,
+                            headers={'ETag': etag})
+        if etag and use_json_fast_path(request):
+            response = HttpResponse(
+                recipe_json(request, versions[0][0]),
+                content_type=request.accepted_media_type
+            )
+        else:
+            response = super().retrieve(request, *args, **kwargs)
+        if etag:
+            response['ETag'] = etag
+        return response
+
+    def get_list_etag(self, request):
+        paginator = self.paginator
+        versions = self.filter_queryset(
+            Recipe.objects.all()
+        ).values_list('id', 'version')
+        page_size = paginator.get_page_size(request)
+        pages = paginator.django_paginator_class(versions, page_size)
+        try:
+            page = pages.page(
+                request.query_params.get(paginator.page_query_param, 1)
+            )
+        except InvalidPage:
+            return None
+        return make_etag(request, [pages.count, *page.object_list])
 
     def get_serializer_class(self):
         if self.request.method in ['POST', 'PATCH', 'PUT']:
@@ -44,6 +183,9 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
+    def perform_destroy(self, instance):
+        delete_recipes(Recipe.objects.filter(pk=instance.pk))
+
     @action(
         methods=['POST', 'DELETE'],
         detail=True,
@@ -105,10 +247,73 @@ class RecipeViewSet(viewsets.ModelViewSet):
                       f"{value['measurement_unit']}\n"
                       for name, value in products_buy.items())
         response = HttpResponse(final_list, 'Content-Type: text/plain')
+        EXPORT_SIZE.labels('shopping_cart').observe(len(response.content))
         response['Content-Disposition'] = ('attachment; '
                                            'filename="products_list.txt"')
         return response
 
+    @action(methods=['GET'], detail=False)
+    def facets(self, request):
+        return Response(get_facets(request))
+
+    @action(methods=['GET'], detail=False)
+    def pantry(self, request):
+        query = PantrySearchSerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        ranked = get_pantry_index().match(
+            query.validated_data['ingredients'],
+            tag_ids=query.validated_data.get('tags'),
+            max_cooking_time=query.validated_data.get('max_cooking_time')
+        )
+        page = self.paginate_queryset(ranked)
+        recipes = self.with_related(Recipe.objects.all()).in_bulk(
+            [recipe_id for recipe_id, _, _ in page]
+        )
+        context = self.get_serializer_context()
+        context['pantry'] = {
+            recipe_id: (coverage, missing)
+            for recipe_id, coverage, missing in page
+        }
+        serializer = PantryRecipeSerializers(
+            [recipes[recipe_id] for recipe_id, _, _ in page
+             if recipe_id in recipes],
+            many=True,
+            context=context
+        )
+        return self.get_paginated_response(serializer.data)
+
+    @action(methods=['GET'], detail=False)
+    def changes(self, request):
+        query = ChangesSerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        since = query.validated_data.get('updated_since')
+        limit = query.validated_data['limit']
+        horizon = get_horizon()
+        recipes = list(self.with_related(changed_since(
+            Recipe.objects.all(),
+            'updated',
+            since,
+            query.validated_data['after'],
+            horizon
+        ))[:limit + 1])
+        has_more = len(recipes) > limit
+        if has_more:
+            recipes = recipes[:limit]
+            until, after = recipes[-1].updated, recipes[-1].id
+        else:
+            until, after = horizon, None
+        serializer = RecipeSerializers(
+            recipes,
+            many=True,
+            context=self.get_serializer_context()
+        )
+        return Response(OrderedDict((
+            ('next', next_link(request, until, after)),
+            ('has_more', has_more),
+            ('results', serializer.data),
+            ('deleted', sorted(deleted_ids(Recipe, since, until))),
+        )))
+
     def create_obj(self, request, related, main_serializer, pk):
         user = self.request.user
         data = {
@@ -139,6 +344,7 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     filter_backends = (DjangoFilterBackend,)
     filter_class = IngredientSearchFilter
     permission_classes = (AdminOrReadOnly,)
+    throttle_costs = {'list': 2}
 
 
 class TagViewSet(viewsets.ReadOnlyModelViewSet):
@@ -151,6 +357,80 @@ class UserViewSet(UserViewSet):
     queryset = User.objects.all()
     pagination_class = PageLimitPagination
     serializer_class = UserSerializers
+    throttle_costs = {'suggestions': 2}
+    suggestions_limit = 10
+    suggestions_max_limit = 50
+
+    @action(
+        detail=False,
+        permission_classes=(IsAuthenticated,),
+        url_path='me/state'
+    )
+    def state(self, request):
+        user = request.user
+        etag = '"%s"' % get_user_state_version(user)
+        if etag_matches(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED,
+                            headers={'ETag': etag})
+        data = {
+            'favorites': sorted(user.favorites.values_list(
+                'recipe_id', flat=True
+            )),
+            'shopping_cart': sorted(user.carts.values_list(
+                'recipe_id', flat=True
+            )),
+            'subscriptions': sorted(get_following_ids(request)),
+        }
+        return Response(data, headers={'ETag': etag})
+
+    @action(
+        detail=False,
+        permission_classes=(IsAuthenticated,),
+        url_path='me/changes'
+    )
+    def changes(self, request):
+        query = ChangesSerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        since = query.validated_data.get('updated_since')
+        user = request.user
+        horizon = get_horizon()
+        return Response(OrderedDict((
+            ('next', next_link(request, horizon)),
+            ('favorites', collection_changes(
+                user.favorites.all(), 'recipe_id', user.id, since, horizon
+            )),
+            ('shopping_cart', collection_changes(
+                user.carts.all(), 'recipe_id', user.id, since, horizon
+            )),
+            ('subscriptions', collection_changes(
+                user.follower.all(), 'following_id', user.id, since, horizon
+            )),
+        )))
+
+    @action(
+        detail=False,
+        permission_classes=(IsAuthenticated,),
+    )
+    def suggestions(self, request):
+        try:
+            limit = int(request.query_params.get(
+                'limit', self.suggestions_limit
+            ))
+        except ValueError:
+            limit = self.suggestions_limit
+        limit = min(max(limit, 1), self.suggestions_max_limit)
+        author_ids = suggest_authors(
+            request.user.id,
+            get_following_ids(request),
+            limit
+        )
+        authors = User.objects.in_bulk(author_ids)
+        serializer = UserSerializers(
+            [authors[pk] for pk in author_ids if pk in authors],
+            many=True,
+            context={'request': request}
+        )
+        return Response(serializer.data)
 
     @action(
         detail=False,
@@ -196,3 +476,22 @@ class UserViewSet(UserViewSet):
             {'detail': 'Вы отписались'},
             status=status.HTTP_204_NO_CONTENT
         )
+
+
+class BatchView(APIView):
+    """Несколько GET-запросов к API за один вызов.
+
+    Подзапросы выполняются в этом же процессе и транзакции, каждый в
+    своей точке сохранения, без middleware и повторной аутентификации.
+    Упавший подзапрос даёт статус 500 только своему элементу. Каждый
+    подзапрос расходует лимит как обычный запрос, сам пакет - ещё один
+    запрос.
+    """
+    permission_classes = (AllowAny,)
+
+    def post(self, request):
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(
+            dispatch_batch(request, serializer.validated_data['requests'])
+        )
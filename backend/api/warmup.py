@@ -0,0 +1,48 @@
+import time
+
+from django.db import connections
+from django.urls import get_resolver, reverse
+
+from recipes.models import Ingredient, Recipe  # isort:skip
+from .filters import RecipeFilters, get_tag_slug_map  # isort:skip
+from .pantry import get_pantry_index  # isort:skip
+from .suggestions import start_graph_build  # isort:skip
+
+
+def warm_urls():
+    get_resolver().url_patterns
+    reverse('recipe-list')
+
+
+def warm_database():
+    for connection in connections.all():
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+
+
+def warm_reference_data():
+    get_tag_slug_map()
+    RecipeFilters(queryset=Recipe.objects.all()).form
+    get_pantry_index()
+    list(Ingredient.objects.values_list('id', 'name', 'measurement_unit'))
+
+
+# Шаги без обращения к БД можно выполнять в мастере до fork.
+PROCESS_STEPS = (
+    ('urls', warm_urls),
+)
+WORKER_STEPS = PROCESS_STEPS + (
+    ('database', warm_database),
+    ('reference data', warm_reference_data),
+    # Граф подписок строится в фоне, воркер не ждёт его.
+    ('suggestions', start_graph_build),
+)
+
+
+def warm_up(steps=WORKER_STEPS):
+    timings = []
+    for name, step in steps:
+        started = time.perf_counter()
+        step()
+        timings.append((name, time.perf_counter() - started))
+    return timings
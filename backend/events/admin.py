@@ -0,0 +1,20 @@
+from django.contrib import admin
+
+from .models import OutboxCheckpoint, OutboxEvent, Tombstone
+
+
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(admin.ModelAdmin):
+    list_display = ('id', 'model', 'object_id', 'action', 'created')
+    list_filter = ('model', 'action')
+
+
+@admin.register(OutboxCheckpoint)
+class OutboxCheckpointAdmin(admin.ModelAdmin):
+    list_display = ('consumer', 'last_event_id', 'updated')
+
+
+@admin.register(Tombstone)
+class TombstoneAdmin(admin.ModelAdmin):
+    list_display = ('id', 'model', 'object_id', 'user_id', 'deleted')
+    list_filter = ('model',)
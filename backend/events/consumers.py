@@ -0,0 +1,9 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def log_events(events):
+    for event in events:
+        logger.info('%s %s %s %s', event.id, event.model, event.action,
+                    event.object_id)
@@ -0,0 +1,57 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, transaction
+from django.utils.module_loading import import_string
+
+from events.models import OutboxCheckpoint  # isort:skip
+from events.outbox import OutboxCursor  # isort:skip
+
+
+class Command(BaseCommand):
+    help = 'deliver outbox events to a consumer in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('consumer', type=str)
+        parser.add_argument('--batch-size', default=500, type=int)
+        parser.add_argument('--follow', action='store_true',
+                            help='keep polling for new events')
+        parser.add_argument('--interval', default=1.0, type=float,
+                            help='seconds between polls with --follow')
+
+    def handle(self, *args, **options):
+        consumers = getattr(settings, 'OUTBOX_CONSUMERS', {})
+        if options['consumer'] not in consumers:
+            raise CommandError(
+                f'Обработчик {options["consumer"]} не найден, '
+                f'доступны: {", ".join(consumers)}'
+            )
+        handler = import_string(consumers[options['consumer']])
+        while True:
+            delivered = self.deliver(
+                options['consumer'],
+                handler,
+                options['batch_size']
+            )
+            if delivered:
+                self.stdout.write(f'{options["consumer"]}: {delivered}')
+                continue
+            if not options['follow']:
+                return
+            time.sleep(options['interval'])
+            close_old_connections()
+
+    def deliver(self, consumer, handler, batch_size):
+        """Доставка хотя бы один раз: события из поздно закоммиченных
+        транзакций приходят позже, вне порядка id."""
+        with transaction.atomic():
+            checkpoint, _ = OutboxCheckpoint.objects.select_for_update(
+            ).get_or_create(consumer=consumer)
+            cursor = OutboxCursor.from_checkpoint(checkpoint)
+            events = list(cursor.events()[:batch_size])
+            if events:
+                handler(events)
+            cursor.advance([event.id for event in events])
+            cursor.save(checkpoint)
+        return len(events)
@@ -0,0 +1,36 @@
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Min
+from django.utils import timezone
+
+from events.models import OutboxCheckpoint, OutboxEvent  # isort:skip
+
+
+class Command(BaseCommand):
+    help = ('delete outbox events every consumer has processed, '
+            'run it periodically')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep-hours', default=24, type=int,
+                            help='keep recent events for in-process readers')
+
+    def handle(self, *args, **options):
+        consumers = getattr(settings, 'OUTBOX_CONSUMERS', {})
+        checkpoints = OutboxCheckpoint.objects.filter(consumer__in=consumers)
+        # Обработчик без позиции ещё ничего не прочитал.
+        if checkpoints.count() < len(consumers):
+            self.stdout.write('Удалено событий: 0')
+            return
+        gaps = set()
+        for checkpoint in checkpoints:
+            gaps.update(map(int, json.loads(checkpoint.gaps)))
+        deleted, _ = OutboxEvent.objects.filter(
+            id__lte=checkpoints.aggregate(Min('last_event_id'))[
+                'last_event_id__min'
+            ] or 0,
+            created__lt=timezone.now() - timedelta(hours=options['keep_hours'])
+        ).exclude(id__in=gaps).delete()
+        self.stdout.write(f'Удалено событий: {deleted}')
@@ -0,0 +1,32 @@
+# Generated by Django 2.2.19 on 2026-10-19 09:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=100, verbose_name='Модель')),
+                ('object_id', models.PositiveIntegerField(verbose_name='Id объекта')),
+                ('user_id', models.PositiveIntegerField(blank=True, null=True, verbose_name='Id пользователя')),
+                ('deleted', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Дата удаления')),
+            ],
+            options={
+                'verbose_name': 'Удалённый объект',
+                'verbose_name_plural': 'Удалённые объекты',
+                'ordering': ('id',),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['model', 'user_id', 'deleted'], name='tombstone_model_user_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.19 on 2026-10-19 09:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0002_auto_20261019_0911'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboxcheckpoint',
+            name='gaps',
+            field=models.TextField(default='{}', verbose_name='Ещё не видимые события ниже позиции'),
+        ),
+    ]
@@ -0,0 +1,96 @@
+from django.db import models
+
+
+class OutboxEvent(models.Model):
+    CREATED = 'created'
+    UPDATED = 'updated'
+    DELETED = 'deleted'
+    ACTIONS = (
+        (CREATED, CREATED),
+        (UPDATED, UPDATED),
+        (DELETED, DELETED)
+    )
+    model = models.CharField(max_length=100, verbose_name='Модель')
+    object_id = models.PositiveIntegerField(verbose_name='Id объекта')
+    action = models.CharField(
+        max_length=10,
+        choices=ACTIONS,
+        verbose_name='Действие'
+    )
+    payload = models.TextField(default='{}', verbose_name='Данные')
+    created = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+        verbose_name='Дата создания'
+    )
+
+    class Meta:
+        ordering = ('id',)
+        verbose_name = 'Событие'
+        verbose_name_plural = 'События'
+
+    def __str__(self):
+        return f'{self.model} {self.object_id} {self.action}'
+
+
+class OutboxCheckpoint(models.Model):
+    consumer = models.CharField(
+        max_length=100,
+        unique=True,
+        verbose_name='Обработчик'
+    )
+    last_event_id = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Последнее обработанное событие'
+    )
+    gaps = models.TextField(
+        default='{}',
+        verbose_name='Ещё не видимые события ниже позиции'
+    )
+    updated = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата обновления'
+    )
+
+    class Meta:
+        ordering = ('consumer',)
+        verbose_name = 'Позиция обработчика'
+        verbose_name_plural = 'Позиции обработчиков'
+
+    def __str__(self):
+        return f'{self.consumer}: {self.last_event_id}'
+
+
+class Tombstone(models.Model):
+    """След удалённой строки для выборок изменений по времени.
+
+    object_id — то, что видит клиент: id рецепта для рецептов, избранного
+    и корзины, id автора для подписок. user_id — владелец записи, у
+    рецептов пустой.
+    """
+    model = models.CharField(max_length=100, verbose_name='Модель')
+    object_id = models.PositiveIntegerField(verbose_name='Id объекта')
+    user_id = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        verbose_name='Id пользователя'
+    )
+    deleted = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+        verbose_name='Дата удаления'
+    )
+
+    class Meta:
+        ordering = ('id',)
+        verbose_name = 'Удалённый объект'
+        verbose_name_plural = 'Удалённые объекты'
+        indexes = [
+            models.Index(
+                fields=('model', 'user_id', 'deleted'),
+                name='tombstone_model_user_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.model} {self.object_id}'
@@ -0,0 +1,85 @@
+"""Чтение outbox без потерь.
+
+Id событий выдаются до коммита, поэтому событие с меньшим id может стать
+видимым позже событий с большими id. Курсор запоминает пропущенные id
+ниже своей позиции и перечитывает их, пока они не появятся или не
+пройдёт OUTBOX_GAP_TIMEOUT секунд: откатившиеся транзакции оставляют
+пропуски навсегда. Таймаут должен быть больше самой долгой транзакции,
+иначе её события будут потеряны.
+"""
+import json
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from .models import OutboxEvent
+
+
+class OutboxCursor:
+
+    def __init__(self, last_event_id=0, gaps=None):
+        self.last_event_id = last_event_id
+        # id пропуска -> когда он замечен, по time.time().
+        self.gaps = dict(gaps or {})
+
+    @classmethod
+    def from_checkpoint(cls, checkpoint):
+        return cls(checkpoint.last_event_id, {
+            int(event_id): noticed
+            for event_id, noticed in json.loads(checkpoint.gaps).items()
+        })
+
+    @classmethod
+    def latest(cls):
+        """Курсор в конце outbox для тех, кто сначала читает таблицы.
+
+        Свежие события, которые ещё могут закоммититься, считаются
+        пропусками.
+        """
+        recent = OutboxEvent.objects.filter(
+            created__gte=timezone.now() - timedelta(seconds=gap_timeout())
+        )
+        cursor = cls(OutboxEvent.objects.exclude(
+            id__in=recent.values('id')
+        ).aggregate(Max('id'))['id__max'] or 0)
+        ids = list(recent.order_by('id').values_list('id', flat=True))
+        if ids and not cursor.last_event_id:
+            cursor.last_event_id = ids[0] - 1
+        cursor.advance(ids)
+        return cursor
+
+    def save(self, checkpoint):
+        checkpoint.last_event_id = self.last_event_id
+        checkpoint.gaps = json.dumps(self.gaps)
+        checkpoint.save()
+
+    def events(self):
+        condition = Q(id__gt=self.last_event_id)
+        if self.gaps:
+            condition |= Q(id__in=list(self.gaps))
+        return OutboxEvent.objects.filter(condition).order_by('id')
+
+    def advance(self, event_ids):
+        """Отмечает прочитанными события с id по возрастанию."""
+        now = time.time()
+        for event_id in event_ids:
+            if event_id <= self.last_event_id:
+                self.gaps.pop(event_id, None)
+                continue
+            # С нулевой позиции пропусков ещё не отличить от начала.
+            if self.last_event_id:
+                for missing in range(self.last_event_id + 1, event_id):
+                    self.gaps[missing] = now
+            self.last_event_id = event_id
+        timeout = gap_timeout()
+        self.gaps = {
+            event_id: noticed for event_id, noticed in self.gaps.items()
+            if now - noticed < timeout
+        }
+
+
+def gap_timeout():
+    return getattr(settings, 'OUTBOX_GAP_TIMEOUT', 600)
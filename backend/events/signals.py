@@ -0,0 +1,156 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+
+from recipes.models import (Cart, Favorite, Ingredient,  # isort:skip
+                            IngredientAmount, Recipe, Tag)
+from recipes.signals import (defer_recipe_change,  # isort:skip
+                             recipe_ingredients_changed, recipes_changed)
+from users.models import Follow  # isort:skip
+from .models import OutboxEvent, Tombstone  # isort:skip
+
+User = get_user_model()
+
+OUTBOX_FIELDS = {
+    Tag: ('name', 'color', 'slug'),
+    Ingredient: ('name', 'measurement_unit'),
+    Recipe: ('author_id', 'name', 'cooking_time'),
+    IngredientAmount: ('recipe_id', 'ingredient_id', 'amount'),
+    Favorite: ('user_id', 'recipe_id'),
+    Cart: ('user_id', 'recipe_id'),
+    Follow: ('user_id', 'following_id'),
+}
+
+# Поле владельца и поле, по которому клиент узнаёт удалённую запись.
+TOMBSTONE_FIELDS = {
+    Recipe: (None, 'id'),
+    Favorite: ('user_id', 'recipe_id'),
+    Cart: ('user_id', 'recipe_id'),
+    Follow: ('user_id', 'following_id'),
+}
+
+
+def mark_delta_write():
+    """Транзакция пишет отметки времени, по которым работает /changes/."""
+    connection.delta_stamped = True
+
+
+def make_event(instance, action):
+    fields = OUTBOX_FIELDS[type(instance)]
+    return OutboxEvent(
+        model=instance._meta.label,
+        object_id=instance.pk,
+        action=action,
+        payload=json.dumps(
+            {field: getattr(instance, field) for field in fields},
+            ensure_ascii=False
+        )
+    )
+
+
+def write_event(instance, action):
+    mark_delta_write()
+    make_event(instance, action).save()
+
+
+def write_events(instances, action):
+    """Для bulk_create и других путей, которые не отправляют сигналы."""
+    mark_delta_write()
+    OutboxEvent.objects.bulk_create(
+        [make_event(instance, action) for instance in instances]
+    )
+
+
+def make_tombstone(instance):
+    user_field, object_field = TOMBSTONE_FIELDS[type(instance)]
+    return Tombstone(
+        model=instance._meta.label,
+        object_id=getattr(instance, object_field),
+        user_id=getattr(instance, user_field) if user_field else None
+    )
+
+
+def write_tombstones(instances):
+    """Для удалений пачками в обход сигналов."""
+    mark_delta_write()
+    Tombstone.objects.bulk_create(
+        [make_tombstone(instance) for instance in instances]
+    )
+
+
+def object_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if (sender is Recipe and defer_recipe_change(instance.pk, created)
+            and not created):
+        return
+    write_event(
+        instance,
+        OutboxEvent.CREATED if created else OutboxEvent.UPDATED
+    )
+
+
+def object_deleted(sender, instance, **kwargs):
+    write_event(instance, OutboxEvent.DELETED)
+    if sender in TOMBSTONE_FIELDS:
+        make_tombstone(instance).save()
+
+
+# Только для своих моделей: приёмник post_delete без sender отключил бы
+# быстрое удаление QuerySet.delete() у всех моделей проекта.
+for model in OUTBOX_FIELDS:
+    post_save.connect(object_saved, sender=model)
+    post_delete.connect(object_deleted, sender=model)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(sender, instance, action, reverse, pk_set,
+                        **kwargs):
+    if not reverse:
+        if (action.startswith('post_')
+                and not defer_recipe_change(instance.pk)):
+            write_event(instance, OutboxEvent.UPDATED)
+    elif action == 'pre_clear':
+        write_events(Recipe.objects.filter(tags=instance),
+                     OutboxEvent.UPDATED)
+    elif action in ('post_add', 'post_remove') and pk_set:
+        write_events(Recipe.objects.filter(pk__in=pk_set),
+                     OutboxEvent.UPDATED)
+
+
+@receiver(recipe_ingredients_changed)
+def recipe_ingredients_replaced(sender, recipe, **kwargs):
+    if not defer_recipe_change(recipe.pk):
+        write_event(recipe, OutboxEvent.UPDATED)
+
+
+@receiver(recipes_changed)
+def recipes_changed_together(sender, recipe_ids, **kwargs):
+    write_events(Recipe.objects.filter(pk__in=recipe_ids),
+                 OutboxEvent.UPDATED)
+
+
+# Рецепт показывает теги, ингредиенты и автора, поэтому их изменение —
+# изменение рецептов, как и для Recipe.version.
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def tag_changed(sender, instance, **kwargs):
+    write_events(Recipe.objects.filter(tags=instance), OutboxEvent.UPDATED)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(pre_delete, sender=Ingredient)
+def ingredient_changed(sender, instance, **kwargs):
+    write_events(Recipe.objects.filter(ingredients=instance),
+                 OutboxEvent.UPDATED)
+
+
+@receiver(post_save, sender=User)
+def author_changed(sender, instance, created, update_fields, **kwargs):
+    if created or update_fields == frozenset(('last_login',)):
+        return
+    write_events(Recipe.objects.filter(author=instance), OutboxEvent.UPDATED)
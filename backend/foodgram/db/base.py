@@ -0,0 +1,54 @@
+"""PostgreSQL с управляемыми соединениями: ENGINE = 'foodgram.db'."""
+import time
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DatabaseError
+from django.db.backends.postgresql import base
+
+from .connections import ManagedConnectionMixin
+
+UTC_NAMES = ('UTC', 'Etc/UTC')
+
+
+class DatabaseWrapper(ManagedConnectionMixin, base.DatabaseWrapper):
+
+    transaction_started = None
+    # Ставит events.signals.mark_delta_write.
+    delta_stamped = False
+
+    def set_autocommit(self, autocommit, *args, **kwargs):
+        if not autocommit:
+            self.transaction_started = time.monotonic()
+            self.delta_stamped = False
+        super().set_autocommit(autocommit, *args, **kwargs)
+
+    def commit(self):
+        # Отметки времени в транзакции не старше её начала. Если она шла
+        # дольше DELTA_SYNC_LAG, /changes/ уже выдал клиентам границу
+        # позже этих отметок, и после коммита изменения никто не увидит.
+        if (self.delta_stamped and self.transaction_started is not None
+                and time.monotonic() - self.transaction_started
+                > settings.DELTA_SYNC_LAG):
+            raise DatabaseError(
+                'Транзакция с изменениями для /changes/ шла дольше '
+                f'DELTA_SYNC_LAG ({settings.DELTA_SYNC_LAG} с)'
+            )
+        super().commit()
+
+    def ensure_timezone(self):
+        if not self.settings_dict.get('TRANSACTION_POOLING'):
+            return super().ensure_timezone()
+        # При пулинге транзакций SET TIME ZONE остался бы на серверном
+        # соединении пулера, которое потом достанется другому клиенту.
+        # Поэтому сервер сам должен работать в UTC: иначе даты придут со
+        # смещением, и utc_tzinfo_factory упадёт на первом же запросе.
+        if self.connection is None:
+            return False
+        timezone_name = self.connection.get_parameter_status('TimeZone')
+        if timezone_name not in UTC_NAMES:
+            raise ImproperlyConfigured(
+                'При DB_TRANSACTION_POOLING PostgreSQL должен работать в '
+                f'UTC, а часовой пояс соединения {timezone_name}'
+            )
+        return False
@@ -0,0 +1,62 @@
+import time
+
+from api.metrics import DB_CONNECT_TIME, DB_CONNECTIONS  # isort:skip
+
+
+class ManagedConnectionMixin:
+    """Постоянное соединение с проверкой перед повторным использованием.
+
+    Соединение переходит от запроса к запросу, пока не проживёт
+    CONN_MAX_AGE секунд. При первом обращении к базе в новом запросе
+    (или после close_old_connections в командах) устаревшее соединение
+    закрывается, а с CONN_HEALTH_CHECKS ещё и проверяется SELECT 1:
+    разорванное пулером или базой соединение открывается заново вместо
+    ошибки в запросе.
+    """
+
+    checked = False
+
+    def connect(self):
+        # connect() сам вызывает ensure_connection() через set_autocommit.
+        self.checked = True
+        started = time.perf_counter()
+        super().connect()
+        DB_CONNECT_TIME.labels('connect').observe(
+            time.perf_counter() - started
+        )
+        DB_CONNECTIONS.labels('opened').inc()
+
+    def ensure_connection(self):
+        # Внутри транзакции соединение подменять нельзя, а с
+        # ATOMIC_REQUESTS первое обращение приходится на atomic() до входа
+        # в блок.
+        if (self.connection is not None and not self.checked
+                and not self.in_atomic_block):
+            self.checked = True
+            result = self.check_connection()
+            DB_CONNECTIONS.labels(result).inc()
+            if result != 'reused':
+                self.close()
+        super().ensure_connection()
+
+    def check_connection(self):
+        if self.close_at is not None and time.time() >= self.close_at:
+            return 'expired'
+        if not self.settings_dict.get('CONN_HEALTH_CHECKS'):
+            return 'reused'
+        started = time.perf_counter()
+        usable = self.is_usable()
+        # Через пулер SELECT 1 ещё и ждёт свободное серверное соединение.
+        DB_CONNECT_TIME.labels('health_check').observe(
+            time.perf_counter() - started
+        )
+        return 'reused' if usable else 'broken'
+
+    def close_if_unusable_or_obsolete(self):
+        # Django вызывает это в начале и в конце каждого запроса. Внутри
+        # есть get_autocommit(), которому проверка ни к чему.
+        self.checked = True
+        try:
+            super().close_if_unusable_or_obsolete()
+        finally:
+            self.checked = False
@@ -29,11 +29,14 @@ INSTALLED_APPS = [
 
     'recipes.apps.RecipesConfig',
     'users.apps.UsersConfig',
+    'events.apps.EventsConfig',
     'api.apps.ApiConfig',
 ]
 
 MIDDLEWARE = [
+    'api.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'api.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -63,30 +66,104 @@ TEMPLATES = [
 WSGI_APPLICATION = 'foodgram.wsgi.application'
 
 
+# За пулером в режиме транзакций (pgbouncer pool_mode=transaction) у
+# соединения не должно быть состояния сессии: ни именованных курсоров,
+# ни SET вне транзакции.
+DB_TRANSACTION_POOLING = os.getenv(
+    'DB_TRANSACTION_POOLING', default='false'
+).lower() == 'true'
+
 DATABASES = {
     'default': {
-        'ENGINE': os.getenv('DB_ENGINE', default='django.db.backends.postgresql'),
+        'ENGINE': os.getenv('DB_ENGINE', default='foodgram.db'),
         'NAME': os.getenv('DB_NAME'),
         'USER': os.getenv('POSTGRES_USER'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD'),
         'HOST': os.getenv('DB_HOST'),
-        'PORT': os.getenv('DB_PORT')
+        'PORT': os.getenv('DB_PORT'),
+        'ATOMIC_REQUESTS': True,
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', default=300)),
+        'CONN_HEALTH_CHECKS': os.getenv(
+            'DB_CONN_HEALTH_CHECKS', default='true'
+        ).lower() == 'true',
+        'TRANSACTION_POOLING': DB_TRANSACTION_POOLING,
+        'DISABLE_SERVER_SIDE_CURSORS': DB_TRANSACTION_POOLING,
+    }
+}
+
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', default=''),
     }
-} 
+}
+
 
+# Лимитам запросов нужен общий кэш (проверка api.E001).
+THROTTLE_ENABLED = os.getenv(
+    'THROTTLE_ENABLED', default='true'
+).lower() == 'true'
 
 REST_FRAMEWORK = { 
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ), 
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ),
     'DEFAULT_FILTER_BACKENDS': (
         'django_filters.rest_framework.DjangoFilterBackend',
-    )
+    ),
+    'DEFAULT_THROTTLE_CLASSES': (
+        'api.throttling.UserCostThrottle',
+        'api.throttling.AnonCostThrottle',
+    ) if THROTTLE_ENABLED else (),
+    'DEFAULT_THROTTLE_RATES': {
+        'user': os.getenv('THROTTLE_USER_RATE', default='120/min'),
+        'anon': os.getenv('THROTTLE_ANON_RATE', default='60/min'),
+    },
+    # Перед бэкендом один nginx, он ставит X-Forwarded-For в адрес
+    # клиента: по нему различаются анонимы в AnonCostThrottle.
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES', default=1)),
+    'DEFAULT_RENDERER_CLASSES': (
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'api.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
 }
 
+COMPRESSION_MIN_SIZE = 1024
+
+# Кэш ленты рецептов для анонимов: секунды свежести, сколько ещё можно
+# отдавать устаревший ответ, и таймаут пересчёта в миллисекундах.
+FEED_CACHE_TTL = int(os.getenv('FEED_CACHE_TTL', default=10))
+FEED_CACHE_STALE_TTL = int(os.getenv('FEED_CACHE_STALE_TTL', default=300))
+FEED_CACHE_LOCK_TIMEOUT = 10
+FEED_CACHE_DB_TIMEOUT = int(os.getenv('FEED_CACHE_DB_TIMEOUT', default=2000))
+FEED_CACHE_MAX_PAGE = 5
+
+# JSON рецептов собирается в базе (api/json_fast_path.py).
+RECIPE_JSON_FAST_PATH = os.getenv(
+    'RECIPE_JSON_FAST_PATH', default='false'
+).lower() == 'true'
+
+# Сколько дней хранятся следы удалений для /changes/ (prune_tombstones).
+DELTA_SYNC_RETENTION_DAYS = int(
+    os.getenv('DELTA_SYNC_RETENTION_DAYS', default=30)
+)
+# На сколько секунд /changes/ отстаёт от текущего времени. Транзакцию,
+# которая пишет отметки времени дольше, foodgram.db не закоммитит: иначе
+# её изменения проскочили бы мимо клиентов. Больше timeout gunicorn.
+DELTA_SYNC_LAG = int(os.getenv('DELTA_SYNC_LAG', default=45))
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -118,6 +195,14 @@ DJOSER = {
 
 AUTH_USER_MODEL = 'users.User'
 
+OUTBOX_CONSUMERS = {
+    'log': 'events.consumers.log_events',
+}
+
+# Сколько секунд ждать событие с пропущенным id: дольше самой долгой
+# транзакции, иначе её события не дойдут до обработчиков.
+OUTBOX_GAP_TIMEOUT = int(os.environ.get('OUTBOX_GAP_TIMEOUT', 600))
+
 LANGUAGE_CODE = 'ru-RU'
 
 TIME_ZONE = 'UTC'
@@ -128,8 +213,27 @@ USE_L10N = True
 
 USE_TZ = True
 
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'django.request': {
+            'handlers': ['console'],
+            'level': 'ERROR',
+        },
+    },
+}
+
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 
+API_SNAPSHOT_ROOT = os.path.join(STATIC_ROOT, 'api-snapshots')
+API_SNAPSHOT_BASE_URL = os.getenv('API_SNAPSHOT_BASE_URL')
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
@@ -0,0 +1,44 @@
+import os
+import shutil
+
+bind = '0:8000'
+preload_app = True
+# Запрос дольше этого убивается вместе с транзакцией. Должно быть меньше
+# DELTA_SYNC_LAG, иначе долгие запросы будут откатываться при коммите.
+timeout = 30
+
+# Метрики воркеров складываются в общую директорию, /metrics их суммирует.
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/prometheus')
+
+
+def on_starting(server):
+    directory = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory)
+
+
+def run_warm_up(server, stage, steps_name):
+    # Прогрев только ускоряет первые запросы: ошибка не должна мешать
+    # запуску мастера или воркера.
+    try:
+        from api import warmup
+        timings = warmup.warm_up(getattr(warmup, steps_name))
+    except Exception:
+        server.log.exception('%s warm-up failed', stage)
+        return
+    for name, duration in timings:
+        server.log.info('%s warm-up %s: %.1f ms', stage, name,
+                        duration * 1000)
+
+
+def when_ready(server):
+    run_warm_up(server, 'master', 'PROCESS_STEPS')
+
+
+def post_fork(server, worker):
+    run_warm_up(server, f'worker {worker.pid}', 'WORKER_STEPS')
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
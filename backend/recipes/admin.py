@@ -1,6 +1,9 @@
 from django.contrib import admin
 
-from .models import Cart, Favorite, Ingredient, IngredientAmount, Recipe, Tag
+from api.admin import BulkDeleteAdminMixin  # isort:skip
+from api.deletion import delete_recipes  # isort:skip
+from .models import (Cart, Favorite, Ingredient,  # isort:skip
+                     IngredientAmount, Recipe, Tag)
 
 
 class IngredientInline(admin.TabularInline):
@@ -8,12 +11,20 @@ class IngredientInline(admin.TabularInline):
 
 
 @admin.register(Recipe)
-class RecipeAdmin(admin.ModelAdmin):
+class RecipeAdmin(BulkDeleteAdminMixin, admin.ModelAdmin):
     inlines = [
         IngredientInline,
     ]
     list_display = ('name', 'author', 'count_favorites')
     list_filter = ('name', 'author', 'tags')
+    bulk_delete = staticmethod(delete_recipes)
+
+    def get_related_querysets(self, pks):
+        return (
+            IngredientAmount.objects.filter(recipe_id__in=pks),
+            Favorite.objects.filter(recipe_id__in=pks),
+            Cart.objects.filter(recipe_id__in=pks),
+        )
 
     def count_favorites(self, obj):
         return obj.favorites.count()
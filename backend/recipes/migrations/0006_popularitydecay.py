@@ -0,0 +1,34 @@
+# Generated by Django 2.2.19 on 2026-10-19 09:28
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def create_decay_state(apps, schema_editor):
+    # Текущие оценки считаются приведёнными к моменту миграции.
+    apps.get_model('recipes', 'PopularityDecay').objects.create(
+        pk=1,
+        decayed_at=timezone.now()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_auto_20261019_0911'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PopularityDecay',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('decayed_at', models.DateTimeField(verbose_name='Дата затухания')),
+            ],
+            options={
+                'verbose_name': 'Затухание популярности',
+                'verbose_name_plural': 'Затухание популярности',
+            },
+        ),
+        migrations.RunPython(create_decay_state, migrations.RunPython.noop),
+    ]
@@ -40,15 +40,71 @@ class Recipe(models.Model):
             ),
         ),
     )
+    version = models.PositiveIntegerField(
+        default=1,
+        editable=False,
+        verbose_name='Версия'
+    )
+    popularity = models.FloatField(
+        default=0,
+        editable=False,
+        verbose_name='Популярность'
+    )
+    trending = models.FloatField(
+        default=0,
+        editable=False,
+        verbose_name='Популярность за последние дни'
+    )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Дата создания'
+    )
+    # Меняется вместе с version, по нему работает /api/recipes/changes/.
+    updated = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения'
+    )
+
+    COUNTER_FIELDS = ('version', 'popularity', 'trending')
 
     class Meta:
         ordering = ('-id',)
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = [
+            models.Index(
+                fields=('-popularity', '-id'),
+                name='recipe_popularity_idx'
+            ),
+            models.Index(
+                fields=('-trending', '-id'),
+                name='recipe_trending_idx'
+            ),
+            models.Index(
+                fields=('cooking_time', '-id'),
+                name='recipe_cooking_time_idx'
+            ),
+            models.Index(
+                fields=('updated', 'id'),
+                name='recipe_updated_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        # Счётчики и оценки меняются только выражениями F() в UPDATE, а
+        # полное сохранение устаревшего экземпляра затёрло бы чужие изменения.
+        if (not self._state.adding and not kwargs.get('force_insert')
+                and kwargs.get('update_fields') is None):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
 
 class Tag(models.Model):
     name = models.CharField(
@@ -143,6 +199,10 @@ class Favorite(models.Model):
         related_name='favorites',
         verbose_name='Рецепт'
     )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Дата добавления'
+    )
 
     class Meta:
         ordering = ('-id',)
@@ -154,6 +214,12 @@ class Favorite(models.Model):
                 name='unique_favorites'
             ),
         ]
+        indexes = [
+            models.Index(
+                fields=('user', 'created'),
+                name='favorite_user_created_idx'
+            ),
+        ]
 
 
 class Cart(models.Model):
@@ -169,6 +235,10 @@ class Cart(models.Model):
         related_name='carts',
         verbose_name='Рецепт'
     )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Дата добавления'
+    )
 
     class Meta:
         ordering = ('-id',)
@@ -180,3 +250,21 @@ class Cart(models.Model):
                 name='unique_recipe_cart'
             ),
         ]
+        indexes = [
+            models.Index(
+                fields=('user', 'created'),
+                name='cart_user_created_idx'
+            ),
+        ]
+
+
+class PopularityDecay(models.Model):
+    """Одна строка: оценки рецептов приведены к моменту decayed_at."""
+    decayed_at = models.DateTimeField(verbose_name='Дата затухания')
+
+    class Meta:
+        verbose_name = 'Затухание популярности'
+        verbose_name_plural = 'Затухание популярности'
+
+    def __str__(self):
+        return str(self.decayed_at)
@@ -0,0 +1,45 @@
+import threading
+from contextlib import contextmanager
+
+from django.dispatch import Signal
+
+# bulk_create не отправляет post_save, поэтому сериализатор рецепта
+# сообщает о замене ингредиентов отдельным сигналом.
+recipe_ingredients_changed = Signal(providing_args=['recipe'])
+
+# Один раз на все рецепты, изменённые внутри recipe_changes().
+recipes_changed = Signal(providing_args=['recipe_ids'])
+
+_pending = threading.local()
+
+
+@contextmanager
+def recipe_changes():
+    """Копит изменения рецептов до конца блока.
+
+    Сохранение, теги и ингредиенты меняют рецепт по отдельности, и без
+    блока каждое изменение увеличивало бы версию и писало событие.
+    Внутри блока обработчики откладывают их через defer_recipe_change,
+    а в конце recipes_changed уходит один раз. Рецепты, созданные в
+    блоке, в него не попадают: о них уже сообщило создание.
+    """
+    if getattr(_pending, 'changed', None) is not None:
+        yield
+        return
+    _pending.changed, _pending.created = set(), set()
+    try:
+        yield
+        recipe_ids = _pending.changed - _pending.created
+    finally:
+        _pending.changed = _pending.created = None
+    if recipe_ids:
+        recipes_changed.send(sender=None, recipe_ids=sorted(recipe_ids))
+
+
+def defer_recipe_change(recipe_id, created=False):
+    """True, если изменение отложено до конца recipe_changes()."""
+    changed = getattr(_pending, 'changed', None)
+    if changed is None:
+        return False
+    (_pending.created if created else changed).add(recipe_id)
+    return True
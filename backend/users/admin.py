@@ -1,15 +1,30 @@
 from django.contrib import admin
+from django.db.models import Q
 
-from .models import Follow, User
+from api.admin import BulkDeleteAdminMixin  # isort:skip
+from api.deletion import delete_users  # isort:skip
+from recipes.models import Cart, Favorite, Recipe  # isort:skip
+from .models import Follow, User  # isort:skip
 
 
 @admin.register(User)
-class UserAdmin(admin.ModelAdmin):
+class UserAdmin(BulkDeleteAdminMixin, admin.ModelAdmin):
     list_display = (
         'id', 'username', 'first_name',
         'last_name', 'email', 'role'
     )
     list_filter = ('username', 'email')
+    bulk_delete = staticmethod(delete_users)
+
+    def get_related_querysets(self, pks):
+        return (
+            Recipe.objects.filter(author_id__in=pks),
+            Favorite.objects.filter(user_id__in=pks),
+            Cart.objects.filter(user_id__in=pks),
+            Follow.objects.filter(
+                Q(user_id__in=pks) | Q(following_id__in=pks)
+            ),
+        )
 
 
 @admin.register(Follow)
@@ -44,6 +44,10 @@ class Follow(models.Model):
         related_name='following_auth',
         verbose_name='Подписка'
     )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Дата подписки'
+    )
 
     class Meta:
         ordering = ('-id',)
@@ -59,3 +63,9 @@ class Follow(models.Model):
                 name='not_sub'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=('user', 'created'),
+                name='follow_user_created_idx'
+            ),
+        ]